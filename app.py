@@ -5,7 +5,8 @@ from fastapi.responses import JSONResponse
 from jet.llm.mlx.model_cache import cleanup_idle_models
 from routes.rerankers.heuristic import router as reranker_heuristic_router
 from routes.rerankers.semantic import router as reranker_semantic_router
-from routes.rag import router as rag_router
+from routes.rerankers.pipeline import router as reranker_pipeline_router
+from routes.rag import router as rag_router, is_rag_loaded, rag_readiness, warm_start_rags
 from routes.ner import router as ner_router
 from routes.prompt import router as prompt_router
 from routes.search import router as search_router
@@ -34,9 +35,22 @@ async def lifespan(app: FastAPI):
     logger.info("Starting cleanup_idle_models task")
     cleanup_task = asyncio.create_task(cleanup_idle_models())
 
+    warmup_task = None
+    warmup_manifest = os.environ.get("RAG_WARMUP_MANIFEST")
+    if warmup_manifest:
+        logger.info(f"Starting RAG warm start from {warmup_manifest}")
+        warmup_task = asyncio.create_task(warm_start_rags(
+            warmup_manifest,
+            concurrency=int(os.environ.get("RAG_WARMUP_CONCURRENCY", "1")),
+        ))
+
     yield  # Application runs here
 
     # Shutdown logic
+    if warmup_task is not None and not warmup_task.done():
+        logger.info("Shutting down, cancelling RAG warm start")
+        warmup_task.cancel()
+
     logger.info("Shutting down, cancelling cleanup_idle_models task")
     tasks = [task for task in asyncio.all_tasks(
     ) if task is not asyncio.current_task()]
@@ -61,11 +75,29 @@ app.middleware("http")(log_exceptions_middleware)
 async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
 
+
+@app.get("/health/ready")
+async def health_ready():
+    """Ready once every warm-start RAG index has been built and is still loaded."""
+    indexes = {
+        name: {**status, "loaded": "key" in status and is_rag_loaded(status["key"])}
+        for name, status in rag_readiness.items()
+    }
+    ready = all(status["status"] == "ready" and status["loaded"]
+                for status in indexes.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "indexes": indexes},
+    )
+
+
 app.include_router(rag_router, prefix="/api/v1/rag", tags=["rag"])
 app.include_router(reranker_heuristic_router,
                    prefix="/api/v1/reranker/heuristic", tags=["reranker", "heuristic"])
 app.include_router(reranker_semantic_router,
                    prefix="/api/v1/reranker/semantic", tags=["reranker", "semantic"])
+app.include_router(reranker_pipeline_router,
+                   prefix="/api/v1/reranker", tags=["reranker", "pipeline"])
 app.include_router(ner_router, prefix="/api/v1/ner", tags=["ner"])
 app.include_router(prompt_router, prefix="/api/v1/prompt", tags=["prompt"])
 app.include_router(search_router, prefix="/api/v1/search", tags=["search"])
@@ -86,8 +118,22 @@ if __name__ == "__main__":
                         help="Host to run the server on")
     parser.add_argument("--port", type=int, default=8002,
                         help="Port to run the server on")
+    parser.add_argument("--warmup-manifest", type=str, default=None,
+                        help="JSON/YAML manifest of RAG indexes to build at startup")
+    parser.add_argument("--cohere-backend", type=str, choices=["cohere", "local"], default=None,
+                        help="Backend of the /cohere reranker (local runs offline)")
+    parser.add_argument("--reranker-runtime", type=str, choices=["torch", "onnx"], default=None,
+                        help="Inference runtime of the semantic rerankers (onnx serves int8 models)")
     args = parser.parse_args()
 
+    if args.warmup_manifest:
+        os.environ["RAG_WARMUP_MANIFEST"] = os.path.abspath(
+            args.warmup_manifest)
+    if args.cohere_backend:
+        os.environ["COHERE_RERANK_BACKEND"] = args.cohere_backend
+    if args.reranker_runtime:
+        os.environ["RERANKER_RUNTIME"] = args.reranker_runtime
+
     import uvicorn
     uvicorn.run(
         "app:app",
@@ -0,0 +1,270 @@
+import re
+from collections import defaultdict
+from typing import Optional, Sequence
+
+import numpy as np
+from llama_index.core.schema import NodeRelationship, NodeWithScore
+
+
+MINHASH_PRIME = (1 << 61) - 1
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def remove_contained_texts(texts: Sequence[str], gram_size: int = 32, stride: int = 16) -> list[int]:
+    """
+    Find texts that are not substrings of any longer (or earlier equal) text.
+
+    Instead of comparing every pair, kept texts are indexed by the character
+    grams that start at positions aligned to `stride`. Any text of length
+    >= gram_size + stride - 1 contained in a kept text must contain one of
+    its aligned grams at one of its first `stride` offsets, so only the kept
+    texts sharing such a gram need to be verified with a real substring check.
+    Shorter texts fall back to a direct scan.
+
+    Args:
+        texts (Sequence[str]): Texts to deduplicate. The input is not modified.
+        gram_size (int): Length of the indexed grams.
+        stride (int): Distance between indexed gram positions in kept texts.
+
+    Returns:
+        list[int]: Indices of the kept texts, ordered from longest to shortest.
+    """
+    order = sorted(range(len(texts)), key=lambda idx: len(texts[idx]), reverse=True)
+    min_indexed_length = gram_size + stride - 1
+
+    kept: list[int] = []
+    gram_index: dict[str, list[int]] = defaultdict(list)
+
+    for idx in order:
+        text = texts[idx]
+
+        if len(text) >= min_indexed_length:
+            candidates = set()
+            for offset in range(stride):
+                candidates.update(gram_index.get(
+                    text[offset:offset + gram_size], ()))
+            is_contained = any(text in texts[other] for other in candidates)
+        else:
+            is_contained = any(text in texts[other] for other in kept)
+
+        if is_contained:
+            continue
+
+        kept.append(idx)
+        for start in range(0, len(text) - gram_size + 1, stride):
+            gram_index[text[start:start + gram_size]].append(idx)
+
+    return kept
+
+
+def remove_contained_spans(nodes: Sequence[NodeWithScore]) -> list[int]:
+    """
+    Find nodes that are not covered by another node from the same source.
+
+    Uses the parent relationship (a child whose parent was also retrieved is
+    redundant) and the `start_char_idx`/`end_char_idx` offsets of nodes that
+    share a source node. Nodes without offsets are always kept.
+
+    Args:
+        nodes (Sequence[NodeWithScore]): Retrieved nodes.
+
+    Returns:
+        list[int]: Indices of the kept nodes, in input order.
+    """
+    node_ids = {item.node.node_id for item in nodes}
+    dropped: set[int] = set()
+
+    spans_by_source: dict[str, list[tuple[int, int, int]]] = defaultdict(list)
+    for idx, item in enumerate(nodes):
+        node = item.node
+        parent = node.relationships.get(NodeRelationship.PARENT)
+        if parent is not None and parent.node_id in node_ids:
+            dropped.add(idx)
+            continue
+
+        source = node.relationships.get(NodeRelationship.SOURCE)
+        start, end = node.start_char_idx, node.end_char_idx
+        if source is not None and start is not None and end is not None:
+            spans_by_source[source.node_id].append((start, end, idx))
+
+    for spans in spans_by_source.values():
+        # Widest span first for equal starts, so nested spans follow their container
+        spans.sort(key=lambda span: (span[0], -span[1]))
+        max_end = -1
+        for start, end, idx in spans:
+            if end <= max_end:
+                dropped.add(idx)
+            else:
+                max_end = end
+
+    return [idx for idx in range(len(nodes)) if idx not in dropped]
+
+
+def find_near_duplicates(
+    texts: Sequence[str],
+    threshold: float = 0.9,
+    num_perm: int = 64,
+    bands: int = 16,
+    ngram_size: int = 3,
+    seed: int = 1,
+) -> set[int]:
+    """
+    Find texts that are near duplicates of an earlier text using MinHash LSH.
+
+    Texts are shingled into word n-grams, hashed into `num_perm` MinHash
+    values and bucketed into `bands` LSH bands. Pairs sharing a bucket are
+    confirmed by their estimated Jaccard similarity.
+
+    Args:
+        texts (Sequence[str]): Texts in priority order; later texts are dropped.
+        threshold (float): Minimum estimated Jaccard similarity to be a duplicate.
+        num_perm (int): Number of MinHash permutations.
+        bands (int): Number of LSH bands. Must divide num_perm.
+        ngram_size (int): Number of words per shingle.
+        seed (int): Seed for the hash permutations.
+
+    Returns:
+        set[int]: Indices of texts that duplicate an earlier text.
+    """
+    if num_perm % bands:
+        raise ValueError("num_perm must be divisible by bands.")
+
+    rng = np.random.default_rng(seed)
+    # Coefficients below 2**32 keep a * hash + b within uint64 for 32-bit hashes
+    a = rng.integers(1, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for idx, text in enumerate(texts):
+        words = _WORD_PATTERN.findall(text.lower())
+        shingles = {
+            " ".join(words[i:i + ngram_size])
+            for i in range(max(len(words) - ngram_size + 1, 1))
+        }
+        hashes = np.fromiter(
+            (hash(shingle) & 0xFFFFFFFF for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        signatures[idx] = ((a * hashes + b) % MINHASH_PRIME).min(axis=1)
+
+    rows = num_perm // bands
+    duplicates: set[int] = set()
+    buckets: dict[tuple[int, bytes], list[int]] = defaultdict(list)
+    for idx in range(len(texts)):
+        signature = signatures[idx]
+        candidates = set()
+        for band in range(bands):
+            key = (band, signature[band * rows:(band + 1) * rows].tobytes())
+            candidates.update(buckets[key])
+            buckets[key].append(idx)
+
+        if any(np.mean(signatures[other] == signature) >= threshold for other in candidates if other not in duplicates):
+            duplicates.add(idx)
+
+    return duplicates
+
+
+def dedupe_nodes(
+    nodes: Sequence[NodeWithScore],
+    near_duplicate_threshold: Optional[float] = None,
+) -> list[NodeWithScore]:
+    """
+    Remove redundant retrieved nodes while preserving their ranking.
+
+    Structural checks (parent/child and character offsets) run first, then
+    exact containment of texts, then optional MinHash near-duplicate removal.
+
+    Args:
+        nodes (Sequence[NodeWithScore]): Retrieved nodes in ranked order.
+        near_duplicate_threshold (Optional[float]): Jaccard threshold for
+            near-duplicate removal. Disabled when None.
+
+    Returns:
+        list[NodeWithScore]: The kept nodes in their original order.
+    """
+    candidates = [nodes[idx] for idx in remove_contained_spans(nodes)]
+    kept = sorted(remove_contained_texts([item.text for item in candidates]))
+    candidates = [candidates[idx] for idx in kept]
+
+    if near_duplicate_threshold is not None:
+        duplicates = find_near_duplicates(
+            [item.text for item in candidates], threshold=near_duplicate_threshold)
+        candidates = [item for idx, item in enumerate(candidates)
+                      if idx not in duplicates]
+
+    return candidates
+
+
+def dedupe_contexts(
+    contexts: Sequence[str],
+    near_duplicate_threshold: Optional[float] = None,
+) -> list[str]:
+    """
+    Remove contexts contained in a longer context, longest first.
+
+    Args:
+        contexts (Sequence[str]): Context texts. The input is not modified.
+        near_duplicate_threshold (Optional[float]): Jaccard threshold for
+            near-duplicate removal. Disabled when None.
+
+    Returns:
+        list[str]: The kept contexts sorted by length, longest first.
+    """
+    result = [contexts[idx] for idx in remove_contained_texts(contexts)]
+
+    if near_duplicate_threshold is not None:
+        duplicates = find_near_duplicates(
+            result, threshold=near_duplicate_threshold)
+        result = [context for idx, context in enumerate(result)
+                  if idx not in duplicates]
+
+    return result
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    def remove_substrings_naive(contexts: list[str]) -> list[str]:
+        contexts = sorted(contexts, key=len, reverse=True)
+        result = []
+        for context in contexts:
+            if not any(context in other for other in result):
+                result.append(context)
+        return result
+
+    random.seed(0)
+    vocabulary = [
+        "".join(random.choices("abcdefghijklmnopqrstuvwxyz", k=random.randint(3, 9)))
+        for _ in range(5000)
+    ]
+    documents = [" ".join(random.choices(vocabulary, k=400)) for _ in range(250)]
+
+    # Mimic hierarchical chunking: full chunks plus nested sub-chunks
+    contexts = []
+    for document in documents:
+        contexts.append(document)
+        for size in [512, 256, 128]:
+            start = random.randint(0, len(document) - size)
+            contexts.append(document[start:start + size])
+    random.shuffle(contexts)
+
+    print(f"Contexts: {len(contexts)}")
+
+    start_time = time.perf_counter()
+    expected = remove_substrings_naive(contexts)
+    naive_elapsed = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    result = dedupe_contexts(contexts)
+    indexed_elapsed = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    near_result = dedupe_contexts(contexts, near_duplicate_threshold=0.9)
+    minhash_elapsed = time.perf_counter() - start_time
+
+    assert result == expected
+    print(f"Naive: {naive_elapsed * 1000:.1f}ms ({len(expected)} kept)")
+    print(f"Indexed: {indexed_elapsed * 1000:.1f}ms ({len(result)} kept)")
+    print(f"Indexed + MinHash: {minhash_elapsed * 1000:.1f}ms ({len(near_result)} kept)")
@@ -0,0 +1,207 @@
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Optional, Sequence, TypedDict
+
+import requests
+from jet._token.token_utils import get_ollama_tokenizer
+from jet.logger import logger
+from llama_index.core.schema import NodeRelationship, NodeWithScore, TextNode
+
+
+OLLAMA_SHOW_URL = "http://localhost:11434/api/show"
+# Ollama's num_ctx when neither the request nor the Modelfile sets one
+OLLAMA_DEFAULT_NUM_CTX = 2048
+MODEL_INFO_RETRY_SECONDS = 300
+DEFAULT_RESERVED_OUTPUT_TOKENS = 512
+# Chat template and separators between contexts
+PROMPT_OVERHEAD_TOKENS = 64
+
+
+_failed_lookups: dict[str, float] = {}
+
+
+class PackingReport(TypedDict):
+    budget: int
+    used_tokens: int
+    dropped_tokens: int
+    selected: int
+    dropped: int
+    merged: int
+
+
+@lru_cache(maxsize=None)
+def _get_tokenizer(model: str):
+    return get_ollama_tokenizer(model)
+
+
+@lru_cache(maxsize=None)
+def _get_model_info(model: str) -> dict:
+    response = requests.post(OLLAMA_SHOW_URL, json={"model": model}, timeout=5)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_context_window(model: str) -> int:
+    """
+    Return the number of prompt tokens Ollama keeps for a model.
+
+    Queries do not pass `num_ctx`, so Ollama truncates prompts at the model's
+    `num_ctx` parameter when it sets one and at OLLAMA_DEFAULT_NUM_CTX
+    otherwise, never above the architecture's `context_length`. When the
+    model info cannot be read the default is used, and the failure is
+    remembered for MODEL_INFO_RETRY_SECONDS so that queries do not each wait
+    on the request timeout.
+    """
+    failed_at = _failed_lookups.get(model)
+    if failed_at is not None and time.monotonic() - failed_at < MODEL_INFO_RETRY_SECONDS:
+        return OLLAMA_DEFAULT_NUM_CTX
+
+    try:
+        info = _get_model_info(model)
+    except Exception as e:
+        logger.warning(f"Could not read the context length of {model}: {e}")
+        _failed_lookups[model] = time.monotonic()
+        return OLLAMA_DEFAULT_NUM_CTX
+    _failed_lookups.pop(model, None)
+
+    context_window = OLLAMA_DEFAULT_NUM_CTX
+    for line in (info.get("parameters") or "").splitlines():
+        name, _, value = line.partition(" ")
+        if name == "num_ctx" and value.strip().isdigit():
+            context_window = int(value.strip())
+
+    for key, value in (info.get("model_info") or {}).items():
+        if key.endswith(".context_length") and isinstance(value, int):
+            return min(context_window, value)
+    return context_window
+
+
+@lru_cache(maxsize=16384)
+def count_tokens(model: str, text: str) -> int:
+    """Count tokens for a model, caching results per (model, text)."""
+    return len(_get_tokenizer(model).encode(text))
+
+
+def merge_adjacent_nodes(nodes: Sequence[NodeWithScore]) -> list[NodeWithScore]:
+    """
+    Merge overlapping or touching chunks from the same source node.
+
+    Chunks are joined in document order using their character offsets, and
+    the merged node keeps the id and metadata of its first part and the best
+    score of its parts. Nodes without a source or offsets are returned
+    unchanged.
+    """
+    merged: list[NodeWithScore] = []
+    by_source: dict[str, list[NodeWithScore]] = defaultdict(list)
+
+    for item in nodes:
+        node = item.node
+        source = node.relationships.get(NodeRelationship.SOURCE)
+        if source is None or node.start_char_idx is None or node.end_char_idx is None:
+            merged.append(item)
+        else:
+            by_source[source.node_id].append(item)
+
+    for items in by_source.values():
+        items.sort(key=lambda item: item.node.start_char_idx)
+        current = items[0]
+        for item in items[1:]:
+            start, end = item.node.start_char_idx, item.node.end_char_idx
+            current_end = current.node.end_char_idx
+            if start > current_end:
+                merged.append(current)
+                current = item
+                continue
+            if end <= current_end:
+                text = current.node.text
+            else:
+                text = current.node.text + item.node.text[current_end - start:]
+            current = NodeWithScore(
+                node=TextNode(
+                    id_=current.node.node_id,
+                    text=text,
+                    metadata=current.node.metadata,
+                    excluded_embed_metadata_keys=current.node.excluded_embed_metadata_keys,
+                    excluded_llm_metadata_keys=current.node.excluded_llm_metadata_keys,
+                    relationships=current.node.relationships,
+                    start_char_idx=current.node.start_char_idx,
+                    end_char_idx=max(end, current_end),
+                ),
+                score=max(current.score or 0.0, item.score or 0.0),
+            )
+        merged.append(current)
+
+    return merged
+
+
+def pack_contexts(
+    nodes: Sequence[NodeWithScore],
+    model: str,
+    context_window: int,
+    query: str = "",
+    system: Optional[str] = None,
+    reserved_output_tokens: int = DEFAULT_RESERVED_OUTPUT_TOKENS,
+) -> tuple[list[NodeWithScore], PackingReport]:
+    """
+    Select the contexts that fit the model's prompt budget.
+
+    Contexts are picked greedily by score per token until the budget left
+    after the query, system prompt and reserved output tokens is used up.
+    Selected chunks that are adjacent in the same document are merged, and
+    the result is ordered by score. Nodes without scores are ranked by their
+    input order.
+
+    Args:
+        nodes (Sequence[NodeWithScore]): Retrieved nodes, best first.
+        model (str): Model whose tokenizer is used for counting.
+        context_window (int): Total tokens the model accepts.
+        query (str): The user query.
+        system (Optional[str]): The system prompt.
+        reserved_output_tokens (int): Tokens kept free for the response.
+
+    Returns:
+        tuple[list[NodeWithScore], PackingReport]: The packed nodes and a
+            report of the tokens used and dropped.
+    """
+    budget = context_window - reserved_output_tokens - PROMPT_OVERHEAD_TOKENS
+    budget -= count_tokens(model, query) if query else 0
+    budget -= count_tokens(model, system) if system else 0
+    budget = max(budget, 0)
+
+    scored = [
+        NodeWithScore(node=item.node, score=item.score if item.score is not None else 1.0 / (rank + 1))
+        for rank, item in enumerate(nodes)
+    ]
+    token_counts = [count_tokens(model, item.node.get_content()) for item in scored]
+
+    order = sorted(
+        range(len(scored)),
+        key=lambda idx: scored[idx].score / max(token_counts[idx], 1),
+        reverse=True,
+    )
+
+    used_tokens = 0
+    selected: list[int] = []
+    for idx in order:
+        if used_tokens + token_counts[idx] <= budget:
+            selected.append(idx)
+            used_tokens += token_counts[idx]
+
+    selected_nodes = merge_adjacent_nodes([scored[idx] for idx in selected])
+    selected_nodes.sort(key=lambda item: item.score, reverse=True)
+
+    used_tokens = sum(count_tokens(model, item.node.get_content())
+                      for item in selected_nodes)
+    selected_set = set(selected)
+    dropped_tokens = sum(count for idx, count in enumerate(token_counts)
+                         if idx not in selected_set)
+
+    return selected_nodes, {
+        "budget": budget,
+        "used_tokens": used_tokens,
+        "dropped_tokens": dropped_tokens,
+        "selected": len(selected),
+        "dropped": len(scored) - len(selected),
+        "merged": len(selected) - len(selected_nodes),
+    }
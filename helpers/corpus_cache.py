@@ -0,0 +1,230 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import numpy as np
+from jet.file.utils import load_file
+from jet.logger import logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def file_signature(path: str) -> tuple[str, int, int]:
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def parse_file(path: str) -> Any:
+    """Parse a data file, with orjson for JSON files when it is installed."""
+    if orjson is not None and path.endswith(".json"):
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    return load_file(path)
+
+
+def estimate_size(obj: Any, seen: Optional[set[int]] = None) -> int:
+    """
+    Approximate deep size in bytes of parsed JSON-like data.
+
+    Objects whose id is in `seen` are skipped and every counted object is
+    added to it, so passing the same set across calls counts shared objects
+    (e.g. records referenced by a view) once.
+    """
+    size = 0
+    seen = set() if seen is None else seen
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            size += item.nbytes
+            continue
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set)):
+            stack.extend(item)
+    return size
+
+
+def build_id_map(data: list[Any]) -> dict[str, dict]:
+    """Map record ids to records, for data files of dicts with an "id"."""
+    return {
+        d["id"]: d for d in data
+        if isinstance(d, dict) and "id" in d
+    }
+
+
+class Corpus:
+    """
+    Parsed records of one data file with lazily built derived views.
+
+    Views (formatted texts, prepared sentences, id maps, ...) are computed
+    on first use and shared by every endpoint reading the same file
+    version. Callers must treat the records and views as read-only.
+    """
+
+    def __init__(self, path: str, signature: tuple[str, int, int], data: list[Any]):
+        self.path = path
+        self.signature = signature
+        self.data = data
+        # Ids of the objects counted in nbytes; all are kept alive by the corpus
+        self._counted: set[int] = set()
+        self.nbytes = estimate_size(data, self._counted)
+        self._views: dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._build_locks: dict[str, threading.Lock] = {}
+
+    def view(self, name: str, build: Callable[[list[Any]], Any]) -> Any:
+        """
+        Return a derived view, building it on first use.
+
+        Views are built outside the corpus lock, so a slow view does not
+        block the others; concurrent requests for the same view wait for a
+        single build.
+        """
+        with self._lock:
+            if name in self._views:
+                return self._views[name]
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                if name in self._views:
+                    return self._views[name]
+
+            try:
+                view = build(self.data)
+                with self._lock:
+                    self._views[name] = view
+                    self.nbytes += estimate_size(view, self._counted)
+            finally:
+                with self._lock:
+                    self._build_locks.pop(name, None)
+            return view
+
+    @property
+    def id_map(self) -> dict[str, dict]:
+        return self.view("id_map", build_id_map)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "records": len(self.data) if isinstance(self.data, list) else 1,
+            "views": sorted(self._views),
+            "nbytes": self.nbytes,
+        }
+
+
+class CorpusCache:
+    """
+    LRU cache of parsed data files, one entry per path.
+
+    An entry is reused while the file's (path, mtime, size) signature is
+    unchanged and reparsed otherwise. When `watchdog` is installed, the
+    directories of cached files are also watched so that entries are
+    dropped as soon as their file changes instead of on the next lookup.
+    """
+
+    def __init__(self, max_size: int = 8):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Corpus] = OrderedDict()
+        self._lock = threading.Lock()
+        self._observer = None
+        self._watched_dirs: set[str] = set()
+
+    def get(self, path: str) -> Corpus:
+        """Return the corpus of a data file, parsing it on a miss."""
+        signature = file_signature(path)
+        key = signature[0]
+        with self._lock:
+            corpus = self._entries.get(key)
+            if corpus is not None and corpus.signature == signature:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return corpus
+            self.misses += 1
+
+        # Parse outside the lock so other files stay available meanwhile
+        corpus = Corpus(path, signature, parse_file(path))
+        with self._lock:
+            self._entries[key] = corpus
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._watch(os.path.dirname(key))
+        logger.info(
+            f"Loaded corpus {path} ({corpus.stats()['records']} records)")
+        return corpus
+
+    def invalidate(self, path: str) -> bool:
+        with self._lock:
+            return self._entries.pop(os.path.abspath(path), None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            corpora = [corpus.stats() for corpus in self._entries.values()]
+            lookups = self.hits + self.misses
+            return {
+                "size": len(corpora),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "nbytes": sum(corpus["nbytes"] for corpus in corpora),
+                "watching": self._observer is not None,
+                "corpora": corpora,
+            }
+
+    def _watch(self, directory: str) -> None:
+        if directory in self._watched_dirs:
+            return
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return
+
+        cache = self
+
+        class InvalidateHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                for path in (event.src_path, getattr(event, "dest_path", "")):
+                    if path and cache.invalidate(path):
+                        logger.info(f"Invalidated corpus {path}")
+
+        if self._observer is None:
+            self._observer = Observer()
+            self._observer.daemon = True
+            self._observer.start()
+        self._observer.schedule(InvalidateHandler(), directory, recursive=False)
+        self._watched_dirs.add(directory)
+
+
+corpus_cache = CorpusCache()
+
+
+def get_corpus(path: str) -> Corpus:
+    """Return the cached corpus of a data file, reloading it when it changed."""
+    return corpus_cache.get(path)
+
+
+def load_cached_file(path: str, default: Optional[Any] = None) -> Any:
+    """Cached, read-only replacement for `load_file` on data files."""
+    if not os.path.isfile(path):
+        return default
+    return get_corpus(path).data
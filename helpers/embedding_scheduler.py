@@ -0,0 +1,221 @@
+import math
+import time
+import queue
+import random
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from jet.logger import logger
+
+
+EmbeddingBackend = Callable[[list[str]], list[list[float]]]
+
+
+class FakeEmbeddingBackend:
+    """
+    Deterministic offline embedding backend.
+
+    Vectors are seeded from a hash of the text, so identical texts always get
+    identical unit vectors. `latency` and `latency_per_text` simulate a
+    remote model for exercising batching behaviour.
+    """
+
+    def __init__(self, dim: int = 32, latency: float = 0.0, latency_per_text: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+        self.latency_per_text = latency_per_text
+        self.calls = 0
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        time.sleep(self.latency + self.latency_per_text * len(texts))
+        return [self.embed_one(text) for text in texts]
+
+    def embed_one(self, text: str) -> list[float]:
+        rng = random.Random(hashlib.sha256(text.encode()).digest())
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dim)]
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+
+class EmbeddingScheduler:
+    """
+    Collects embedding requests from concurrent callers into micro-batches.
+
+    A worker thread drains the request queue until `batch_size` texts are
+    collected or `max_wait` seconds have passed since the first one, embeds
+    the unique texts of the batch in one backend call and resolves each
+    caller's future. The batch size adapts to observed latency: it halves,
+    down to `min_batch_size`, when a batch takes longer than
+    `target_latency`, and grows back by a quarter (up to `max_batch_size`)
+    after each full batch that finishes under `recovery_ratio` of it.
+    """
+
+    def __init__(
+        self,
+        backend: EmbeddingBackend,
+        max_batch_size: int = 64,
+        max_wait: float = 0.01,
+        target_latency: float = 0.5,
+        min_batch_size: int = 8,
+        recovery_ratio: float = 0.8,
+    ):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.min_batch_size = max(1, min(min_batch_size, max_batch_size))
+        self.recovery_ratio = recovery_ratio
+        self.max_wait = max_wait
+        self.target_latency = target_latency
+        self.batch_size = max_batch_size
+
+        self.batches = 0
+        self.texts = 0
+        self.deduplicated = 0
+        self.last_latency: Optional[float] = None
+
+        self._queue: queue.Queue[Optional[tuple[str, Future]]] = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for embedding and return a future for its vector."""
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts through the shared batches and wait for the results."""
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._worker.join()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "deduplicated": self.deduplicated,
+            "batch_size": self.batch_size,
+            "avg_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "last_latency": self.last_latency,
+        }
+
+    def _collect_batch(self, first: tuple[str, Future]) -> tuple[list[tuple[str, Future]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch, closing = self._collect_batch(first)
+            self._process_batch(batch)
+            if closing:
+                return
+
+    def _process_batch(self, batch: list[tuple[str, Future]]) -> None:
+        futures_by_text: dict[str, list[Future]] = {}
+        for text, future in batch:
+            futures_by_text.setdefault(text, []).append(future)
+        unique_texts = list(futures_by_text)
+
+        start_time = time.perf_counter()
+        try:
+            embeddings = self.backend(unique_texts)
+            if len(embeddings) != len(unique_texts):
+                raise ValueError(
+                    f"Embedding backend returned {len(embeddings)} vectors for {len(unique_texts)} texts")
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(unique_texts)} failed: {e}")
+            for future in (future for futures in futures_by_text.values() for future in futures):
+                future.set_exception(e)
+            return
+        latency = time.perf_counter() - start_time
+
+        for text, embedding in zip(unique_texts, embeddings):
+            for future in futures_by_text[text]:
+                future.set_result(embedding)
+
+        self.batches += 1
+        self.texts += len(batch)
+        self.deduplicated += len(batch) - len(unique_texts)
+        self.last_latency = latency
+        self._adapt_batch_size(len(batch), latency)
+
+    def _adapt_batch_size(self, size: int, latency: float) -> None:
+        if latency > self.target_latency:
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+        elif latency < self.target_latency * self.recovery_ratio and size >= self.batch_size:
+            self.batch_size = min(self.max_batch_size,
+                                  self.batch_size + max(1, self.batch_size // 4))
+
+
+_schedulers: dict[str, EmbeddingScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_embedding_scheduler(embed_model: str, backend: Optional[EmbeddingBackend] = None) -> EmbeddingScheduler:
+    """
+    Return the shared scheduler for an embedding model, creating it on first use.
+
+    The default backend is `get_ollama_embedding_function(embed_model)`.
+    """
+    with _schedulers_lock:
+        if embed_model not in _schedulers:
+            if backend is None:
+                from jet.llm.utils.embeddings import get_ollama_embedding_function
+                backend = get_ollama_embedding_function(embed_model)
+            _schedulers[embed_model] = EmbeddingScheduler(backend)
+        return _schedulers[embed_model]
+
+
+def get_scheduled_embedding_function(embed_model: str) -> Callable[[str | list[str]], list[float] | list[list[float]]]:
+    """
+    Drop-in replacement for `get_ollama_embedding_function` that routes
+    calls through the shared scheduler for the model.
+    """
+    scheduler = get_embedding_scheduler(embed_model)
+
+    def embed(texts: str | list[str]) -> list[float] | list[list[float]]:
+        if isinstance(texts, str):
+            return scheduler.submit(texts).result()
+        return scheduler.embed(texts)
+
+    return embed
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    backend = FakeEmbeddingBackend(latency=0.02, latency_per_text=0.0005)
+    scheduler = EmbeddingScheduler(backend, max_batch_size=64, max_wait=0.005)
+    queries = [f"query {i % 200}" for i in range(2000)]
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        results = list(executor.map(
+            lambda text: scheduler.submit(text).result(), queries))
+    elapsed = time.perf_counter() - start_time
+
+    assert results[0] == backend.embed_one(queries[0])
+    logger.info(
+        f"{len(queries)} texts in {elapsed:.2f}s with {backend.calls} backend calls: {scheduler.stats()}")
+    scheduler.close()
@@ -0,0 +1,40 @@
+from collections import defaultdict
+from typing import Any, Callable, Hashable, Sequence
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Any]],
+    k: int = 60,
+    key: Callable[[Any], Hashable] = lambda item: item,
+    top_k: int | None = None,
+) -> list[tuple[Any, float]]:
+    """
+    Merge ranked lists with reciprocal rank fusion.
+
+    Each item scores sum(1 / (k + rank)) over the lists it appears in, so
+    items ranked highly by several lists come first. Items are deduplicated by
+    `key`, keeping the first occurrence.
+
+    Args:
+        rankings (Sequence[Sequence[Any]]): Ranked lists, best first.
+        k (int): Rank smoothing constant.
+        key (Callable[[Any], Hashable]): Returns the identity of an item.
+        top_k (int | None): Maximum number of fused items to return.
+
+    Returns:
+        list[tuple[Any, float]]: (item, fused score) pairs, best first.
+    """
+    scores: dict[Hashable, float] = defaultdict(float)
+    items: dict[Hashable, Any] = {}
+
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            item_key = key(item)
+            scores[item_key] += 1.0 / (k + rank)
+            items.setdefault(item_key, item)
+
+    fused = sorted(scores.items(), key=lambda entry: entry[1], reverse=True)
+    if top_k is not None:
+        fused = fused[:top_k]
+
+    return [(items[item_key], score) for item_key, score in fused]
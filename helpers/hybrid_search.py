@@ -0,0 +1,509 @@
+import os
+import re
+import json
+import hashlib
+from collections import Counter
+from concurrent.futures import Future
+from typing import Callable, Iterable, Literal, Optional, Sequence
+
+import numpy as np
+from jet.llm.ollama.constants import OLLAMA_LARGE_EMBED_MODEL
+from jet.logger import logger
+from llama_index.core.node_parser.text.sentence import SentenceSplitter
+from llama_index.core.retrievers.fusion_retriever import FUSION_MODES
+from llama_index.core.schema import BaseNode, Document
+
+from helpers.embedding_scheduler import get_embedding_scheduler, get_scheduled_embedding_function
+from helpers.fusion import reciprocal_rank_fusion
+from helpers.node_store import CompactNodeStore
+from helpers.quantized_embeddings import EmbeddingDtype, QuantizedEmbeddings
+
+
+DEFAULT_TOP_K = 10
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted index with precomputed BM25 statistics.
+
+    Postings are stored in CSR layout: the postings of term `t` are
+    `doc_ids[indptr[t]:indptr[t + 1]]` with matching `term_freqs`. IDF values
+    and per-document length norms are computed once at build time, so scoring
+    a query is a gather plus a `np.bincount` over the matching postings.
+    """
+
+    ARRAY_NAMES = ("indptr", "doc_ids", "term_freqs", "idf", "norms")
+
+    def __init__(
+        self,
+        vocab: dict[str, int],
+        indptr: np.ndarray,
+        doc_ids: np.ndarray,
+        term_freqs: np.ndarray,
+        idf: np.ndarray,
+        norms: np.ndarray,
+        k1: float = 1.5,
+    ):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.idf = idf
+        self.norms = norms
+        self.k1 = k1
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.norms)
+
+    @classmethod
+    def build(cls, texts: Sequence[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        vocab: dict[str, int] = {}
+        term_ids: list[int] = []
+        doc_ids: list[int] = []
+        term_freqs: list[int] = []
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            for term, freq in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                term_freqs.append(freq)
+
+        term_ids_array = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids_array, kind="stable")
+        doc_freqs = np.bincount(term_ids_array, minlength=len(vocab))
+
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(doc_freqs, out=indptr[1:])
+
+        num_docs = len(texts)
+        idf = np.log1p((num_docs - doc_freqs + 0.5) /
+                       (doc_freqs + 0.5)).astype(np.float32)
+        avg_length = doc_lengths.mean() if num_docs else 0.0
+        norms = (k1 * (1 - b + b * doc_lengths / avg_length)
+                 if avg_length else np.full(num_docs, k1)).astype(np.float32)
+
+        return cls(
+            vocab=vocab,
+            indptr=indptr,
+            doc_ids=np.asarray(doc_ids, dtype=np.int32)[order],
+            term_freqs=np.asarray(term_freqs, dtype=np.float32)[order],
+            idf=idf,
+            norms=norms,
+            k1=k1,
+        )
+
+    def score(self, query: str) -> np.ndarray:
+        """Return the BM25 score of every document for the query."""
+        term_ids = [self.vocab[term]
+                    for term in tokenize(query) if term in self.vocab]
+        if not term_ids:
+            return np.zeros(self.num_docs, dtype=np.float32)
+
+        slices = [slice(self.indptr[t], self.indptr[t + 1]) for t in term_ids]
+        doc_ids = np.concatenate([self.doc_ids[s] for s in slices])
+        term_freqs = np.concatenate([self.term_freqs[s] for s in slices])
+        idf = np.repeat(self.idf[term_ids], [s.stop - s.start for s in slices])
+
+        weights = idf * term_freqs * (self.k1 + 1) / \
+            (term_freqs + self.norms[doc_ids])
+        return np.bincount(doc_ids, weights=weights, minlength=self.num_docs).astype(np.float32)
+
+    def score_batch(self, queries: Sequence[str]) -> np.ndarray:
+        """
+        Return a (num_queries, num_docs) BM25 score matrix.
+
+        The postings of every (query, term) pair are gathered into flat
+        arrays and accumulated with a single `np.bincount` over
+        `query * num_docs + doc_id`.
+        """
+        query_rows: list[int] = []
+        term_ids: list[int] = []
+        for row, query in enumerate(queries):
+            for term in tokenize(query):
+                if term in self.vocab:
+                    query_rows.append(row)
+                    term_ids.append(self.vocab[term])
+
+        num_queries = len(queries)
+        if not term_ids:
+            return np.zeros((num_queries, self.num_docs), dtype=np.float32)
+
+        term_ids_array = np.asarray(term_ids, dtype=np.int64)
+        starts = self.indptr[term_ids_array]
+        lengths = self.indptr[term_ids_array + 1] - starts
+        # Flat positions of every posting of every (query, term) pair
+        pair_offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        positions = np.repeat(starts, lengths) + \
+            np.arange(lengths.sum()) - pair_offsets
+
+        doc_ids = self.doc_ids[positions]
+        term_freqs = self.term_freqs[positions]
+        idf = np.repeat(self.idf[term_ids_array], lengths)
+        rows = np.repeat(np.asarray(query_rows, dtype=np.int64), lengths)
+
+        weights = idf * term_freqs * (self.k1 + 1) / \
+            (term_freqs + self.norms[doc_ids])
+        scores = np.bincount(rows * self.num_docs + doc_ids, weights=weights,
+                             minlength=num_queries * self.num_docs)
+        return scores.reshape(num_queries, self.num_docs).astype(np.float32)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        np.savez(os.path.join(directory, "bm25.npz"),
+                 **{name: getattr(self, name) for name in self.ARRAY_NAMES})
+        with open(os.path.join(directory, "bm25_meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "vocab": self.vocab}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "BM25Index":
+        with open(os.path.join(directory, "bm25_meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        with np.load(os.path.join(directory, "bm25.npz")) as arrays:
+            return cls(vocab=meta["vocab"], k1=meta["k1"],
+                       **{name: arrays[name] for name in cls.ARRAY_NAMES})
+
+
+class HybridRetriever:
+    """
+    Retriever combining a BM25 inverted index with dense embedding scores.
+
+    Both indexes are built once per corpus and nodes are kept in a
+    `CompactNodeStore`. Dense vectors are L2-normalized
+    so cosine similarity is a single matrix-vector product, and can be held
+    in float16 or int8 to fit more indexes in memory.
+    """
+
+    def __init__(
+        self,
+        nodes: Sequence[BaseNode],
+        bm25_index: BM25Index,
+        embeddings: QuantizedEmbeddings,
+        embed_func: Callable[[list[str]], list[list[float]]],
+        rescore_top_k: int = 0,
+    ):
+        self.node_store = CompactNodeStore(nodes)
+        self.bm25_index = bm25_index
+        self.embeddings = embeddings
+        self.embed_func = embed_func
+        self.rescore_top_k = rescore_top_k
+        self._warned_rescore = False
+
+    @classmethod
+    def from_nodes(
+        cls,
+        nodes: Sequence[BaseNode],
+        embed_model: str,
+        store_path: Optional[str] = None,
+        embedding_dtype: EmbeddingDtype = "float32",
+        rescore_top_k: int = 0,
+        prefetched: Optional[Sequence[Future]] = None,
+    ) -> "HybridRetriever":
+        """
+        Build the retriever, reusing an index persisted under `store_path`
+        when one exists for the same corpus and embedding model.
+
+        With a quantized `embedding_dtype`, the persisted float32 matrix is
+        memory-mapped and used only to rescore the `rescore_top_k` best
+        approximate candidates. `prefetched` holds embedding futures already
+        submitted for the node texts, in node order.
+        """
+        embed_func = get_scheduled_embedding_function(embed_model)
+        texts = [node.get_content() for node in nodes]
+
+        index_dir = None
+        if store_path:
+            corpus_hash = hashlib.sha256(
+                json.dumps([embed_model, texts]).encode()).hexdigest()
+            index_dir = os.path.join(store_path, "hybrid", corpus_hash)
+
+        if index_dir and os.path.isfile(os.path.join(index_dir, "embeddings.npy")):
+            logger.debug(f"Loading hybrid index from {index_dir}")
+            bm25_index = BM25Index.load(index_dir)
+            embeddings = np.load(os.path.join(index_dir, "embeddings.npy"),
+                                 mmap_mode=None if embedding_dtype == "float32" else "r")
+        else:
+            logger.debug(f"Building hybrid index for {len(texts)} nodes...")
+            bm25_index = BM25Index.build(texts)
+            vectors = [future.result() for future in prefetched] \
+                if prefetched is not None else embed_func(texts)
+            embeddings = normalize_rows(np.asarray(vectors, dtype=np.float32))
+            if index_dir:
+                bm25_index.save(index_dir)
+                np.save(os.path.join(index_dir, "embeddings.npy"), embeddings)
+                if embedding_dtype != "float32":
+                    embeddings = np.load(os.path.join(
+                        index_dir, "embeddings.npy"), mmap_mode="r")
+
+        full_precision = embeddings if isinstance(
+            embeddings, np.memmap) else None
+        quantized = QuantizedEmbeddings.quantize(
+            embeddings, dtype=embedding_dtype, full_precision=full_precision)
+
+        return cls(nodes, bm25_index, quantized, embed_func, rescore_top_k=rescore_top_k)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = DEFAULT_TOP_K,
+        fusion: Literal["weighted", "rrf"] = "rrf",
+        alpha: float = 0.5,
+        rrf_k: int = 60,
+        rescore_top_k: Optional[int] = None,
+    ) -> list[tuple[int, float]]:
+        """
+        Score all nodes against the query and fuse sparse and dense scores.
+
+        Args:
+            query (str): The search query.
+            top_k (int): Number of results to return.
+            fusion (str): "weighted" for min-max normalized score blending,
+                "rrf" for reciprocal rank fusion.
+            alpha (float): Weight of the dense score in weighted fusion.
+            rrf_k (int): Rank smoothing constant for RRF.
+            rescore_top_k (Optional[int]): Quantized candidates to rescore in
+                full precision; defaults to the retriever's setting.
+
+        Returns:
+            list[tuple[int, float]]: (node index, fused score), best first.
+        """
+        return self.search_batch([query], top_k=top_k, fusion=fusion, alpha=alpha, rrf_k=rrf_k, rescore_top_k=rescore_top_k)[0]
+
+    def search_batch(
+        self,
+        queries: Sequence[str],
+        top_k: int = DEFAULT_TOP_K,
+        fusion: Literal["weighted", "rrf"] = "rrf",
+        alpha: float = 0.5,
+        rrf_k: int = 60,
+        rescore_top_k: Optional[int] = None,
+    ) -> list[list[tuple[int, float]]]:
+        """
+        Search many queries at once.
+
+        All queries are embedded in one call and scored against the dense
+        matrix with a single (blocked) matrix multiplication, and BM25 scores
+        come from one `score_batch` call; only fusion runs per query.
+        Arguments match `search`.
+        """
+        top_k = min(top_k, len(self.node_store))
+        if not top_k or not queries:
+            return [[] for _ in queries]
+
+        if rescore_top_k is None:
+            rescore_top_k = self.rescore_top_k
+        if rescore_top_k and self.embeddings.dtype != "float32" and not self.embeddings.can_rescore:
+            if not self._warned_rescore:
+                logger.warning(
+                    "rescore_top_k needs the float32 matrix persisted under store_path; returning approximate scores")
+                self._warned_rescore = True
+            rescore_top_k = 0
+
+        query_embeddings = normalize_rows(np.asarray(
+            self.embed_func(list(queries)), dtype=np.float32))
+        dense_scores = self.embeddings.scores(
+            query_embeddings, rescore_top_k=max(rescore_top_k, top_k) if rescore_top_k else 0)
+
+        sparse_scores = self.bm25_index.score_batch(queries)
+
+        return [
+            self._fuse(dense_scores[idx], sparse_scores[idx],
+                       top_k, fusion, alpha, rrf_k)
+            for idx in range(len(queries))
+        ]
+
+    def _fuse(
+        self,
+        dense_scores: np.ndarray,
+        sparse_scores: np.ndarray,
+        top_k: int,
+        fusion: Literal["weighted", "rrf"],
+        alpha: float,
+        rrf_k: int,
+    ) -> list[tuple[int, float]]:
+        if fusion == "weighted":
+            fused = alpha * min_max_normalize(dense_scores) + \
+                (1 - alpha) * min_max_normalize(sparse_scores)
+            indices = top_k_indices(fused, top_k)
+            return [(int(idx), float(fused[idx])) for idx in indices]
+
+        candidates = min(len(self.node_store), max(top_k * 4, 50))
+        rankings = [
+            top_k_indices(dense_scores, candidates).tolist(),
+            top_k_indices(sparse_scores, candidates).tolist(),
+        ]
+        return reciprocal_rank_fusion(rankings, k=rrf_k, top_k=top_k)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def min_max_normalize(scores: np.ndarray) -> np.ndarray:
+    low, high = scores.min(), scores.max()
+    if high - low < 1e-12:
+        return np.zeros_like(scores)
+    return (scores - low) / (high - low)
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, best first, without a full sort."""
+    if top_k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def setup_hybrid_search(
+    documents: list[Document],
+    embed_model: str = OLLAMA_LARGE_EMBED_MODEL,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: int = 40,
+    store_path: Optional[str] = None,
+    embedding_dtype: EmbeddingDtype = "float32",
+    rescore_top_k: int = 0,
+    file_documents: Optional[Iterable[tuple[str, list[Document]]]] = None,
+    **kwargs,
+) -> Callable:
+    """
+    Build a hybrid BM25 + dense retriever and return a query callback.
+
+    The callback follows the contract of the llama_index based setups in
+    `jet.llm.query.retrievers` and returns a dict with "nodes" and "texts".
+    `FUSION_MODES.RECIPROCAL_RANK` selects RRF; any other fusion mode blends
+    normalized scores weighted by `hybrid_alpha`.
+
+    `file_documents` streams (path, documents) pairs, e.g. from
+    `iter_documents_parallel`, in place of `documents`. Each file is split
+    as soon as it arrives and, when there is no `store_path` index to reuse,
+    its chunks are queued for embedding while later files are still parsed.
+    """
+    splitter = SentenceSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap) if chunk_size else None
+
+    def split(documents: list[Document]) -> list[BaseNode]:
+        return splitter.get_nodes_from_documents(documents) if splitter else documents
+
+    prefetched = None
+    if file_documents is None:
+        nodes = split(documents)
+    else:
+        # The corpus hash of a persisted index is only known once every file
+        # is parsed, so embeddings are prefetched only when nothing is reused
+        scheduler = None if store_path else get_embedding_scheduler(embed_model)
+        nodes_by_path: dict[str, list[BaseNode]] = {}
+        futures_by_path: dict[str, list[Future]] = {}
+        for path, documents in file_documents:
+            nodes_by_path[path] = split(documents)
+            if scheduler:
+                futures_by_path[path] = [
+                    scheduler.submit(node.get_content()) for node in nodes_by_path[path]]
+
+        # Files finish in any order; path order keeps the corpus hash stable
+        paths = sorted(nodes_by_path)
+        nodes = [node for path in paths for node in nodes_by_path[path]]
+        if scheduler:
+            prefetched = [future for path in paths for future in futures_by_path[path]]
+
+    retriever = HybridRetriever.from_nodes(
+        nodes,
+        embed_model=embed_model,
+        store_path=store_path,
+        embedding_dtype=embedding_dtype,
+        rescore_top_k=rescore_top_k,
+        prefetched=prefetched,
+    )
+
+    def to_result(results: list[tuple[int, float]], score_threshold: float) -> dict:
+        nodes_with_scores = [
+            retriever.node_store.materialize(idx, score=score)
+            for idx, score in results
+            if score >= score_threshold
+        ]
+        return {
+            "nodes": nodes_with_scores,
+            "texts": [node.text for node in nodes_with_scores],
+        }
+
+    def query_nodes(
+        query: str,
+        top_k: Optional[int] = None,
+        score_threshold: float = 0.0,
+        fusion_mode: FUSION_MODES = FUSION_MODES.RECIPROCAL_RANK,
+        hybrid_alpha: float = 0.5,
+        rescore_top_k: Optional[int] = None,
+        **kwargs,
+    ) -> dict:
+        fusion = "rrf" if fusion_mode == FUSION_MODES.RECIPROCAL_RANK else "weighted"
+        results = retriever.search(
+            query, top_k=top_k or DEFAULT_TOP_K, fusion=fusion, alpha=hybrid_alpha, rescore_top_k=rescore_top_k)
+        return to_result(results, score_threshold)
+
+    def batch_query_nodes(
+        queries: list[str],
+        top_k: Optional[int] = None,
+        score_threshold: float = 0.0,
+        fusion_mode: FUSION_MODES = FUSION_MODES.RECIPROCAL_RANK,
+        hybrid_alpha: float = 0.5,
+        rescore_top_k: Optional[int] = None,
+        **kwargs,
+    ) -> list[dict]:
+        fusion = "rrf" if fusion_mode == FUSION_MODES.RECIPROCAL_RANK else "weighted"
+        batch_results = retriever.search_batch(
+            queries, top_k=top_k or DEFAULT_TOP_K, fusion=fusion, alpha=hybrid_alpha, rescore_top_k=rescore_top_k)
+        return [to_result(results, score_threshold) for results in batch_results]
+
+    # Lets RAG.get_results_batch score all queries with one matrix product
+    query_nodes.batch = batch_query_nodes
+
+    return query_nodes
+
+
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+    from helpers.rag import RAG
+
+    rag_dir = "/Users/jethroestrada/Desktop/External_Projects/Jet_Projects/JetScripts/data/jet-resume/data"
+    store_path = "/Users/jethroestrada/Desktop/External_Projects/Jet_Projects/jet_server/.cache/hybrid"
+    queries = [
+        "Tell me about yourself.",
+        "What are your primary skills?",
+        "Describe your recent projects.",
+        "Which frameworks have you used for mobile development?",
+    ]
+
+    for mode in ["fusion", "hybrid"]:
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        rag = RAG(
+            rag_dir,
+            mode=mode,
+            embed_model="mxbai-embed-large",
+            chunk_size=512,
+            chunk_overlap=40,
+            store_path=store_path,
+            extensions=[".md", ".mdx", ".rst"],
+        )
+        setup_elapsed = time.perf_counter() - start_time
+        _, setup_peak = tracemalloc.get_traced_memory()
+
+        start_time = time.perf_counter()
+        for query in queries:
+            rag.get_results(query, top_k=10)
+        query_elapsed = (time.perf_counter() - start_time) / len(queries)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        logger.info(
+            f"{mode}: setup {setup_elapsed:.2f}s (peak {setup_peak / 1e6:.1f}MB), "
+            f"query {query_elapsed * 1000:.1f}ms, resident {current / 1e6:.1f}MB, peak {peak / 1e6:.1f}MB")
@@ -0,0 +1,156 @@
+import sys
+import json
+from typing import Optional, Sequence
+
+import numpy as np
+from llama_index.core.schema import BaseNode, NodeRelationship, NodeWithScore, RelatedNodeInfo, TextNode
+
+
+class CompactNodeStore:
+    """
+    Columnar, read-only storage for the nodes of an in-memory index.
+
+    All node texts live in one UTF-8 byte buffer addressed by byte offsets,
+    so a single non-ASCII character does not widen the whole buffer to two
+    or four bytes per character as a joined `str` would.
+    Source documents are integer ids into a table of document ids, metadata
+    dicts are deduplicated (chunks of one document usually share theirs) with
+    interned keys, and parent links are stored as row indices. Rich
+    `TextNode` objects are only materialized for the rows a query returns.
+    """
+
+    def __init__(self, nodes: Sequence[BaseNode]):
+        encoded_texts: list[bytes] = []
+        self.node_ids: list[str] = []
+        self.doc_ids: list[str] = []
+        self.metadatas: list[dict] = []
+
+        doc_codes: dict[str, int] = {}
+        metadata_codes: dict[str, int] = {}
+        row_by_node_id: dict[str, int] = {}
+
+        num_nodes = len(nodes)
+        self.text_offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        self.doc_codes = np.full(num_nodes, -1, dtype=np.int32)
+        self.metadata_codes = np.zeros(num_nodes, dtype=np.int32)
+        self.char_spans = np.full((num_nodes, 2), -1, dtype=np.int64)
+        self.parent_rows = np.full(num_nodes, -1, dtype=np.int32)
+        parent_ids: list[Optional[str]] = []
+
+        for row, node in enumerate(nodes):
+            encoded = node.get_content().encode("utf-8")
+            encoded_texts.append(encoded)
+            self.text_offsets[row + 1] = self.text_offsets[row] + len(encoded)
+            self.node_ids.append(node.node_id)
+            row_by_node_id[node.node_id] = row
+
+            source = node.relationships.get(NodeRelationship.SOURCE)
+            if source is not None:
+                if source.node_id not in doc_codes:
+                    doc_codes[source.node_id] = len(self.doc_ids)
+                    self.doc_ids.append(source.node_id)
+                self.doc_codes[row] = doc_codes[source.node_id]
+
+            metadata_key = json.dumps(node.metadata, sort_keys=True, default=str)
+            if metadata_key not in metadata_codes:
+                metadata_codes[metadata_key] = len(self.metadatas)
+                self.metadatas.append(
+                    {sys.intern(key): value for key, value in node.metadata.items()})
+            self.metadata_codes[row] = metadata_codes[metadata_key]
+
+            start = getattr(node, "start_char_idx", None)
+            end = getattr(node, "end_char_idx", None)
+            if start is not None and end is not None:
+                self.char_spans[row] = (start, end)
+
+            parent = node.relationships.get(NodeRelationship.PARENT)
+            parent_ids.append(parent.node_id if parent is not None else None)
+
+        for row, parent_id in enumerate(parent_ids):
+            if parent_id is not None:
+                self.parent_rows[row] = row_by_node_id.get(parent_id, -1)
+        # Parents outside the store keep their id for materialization
+        self._external_parents = {
+            row: parent_id for row, parent_id in enumerate(parent_ids)
+            if parent_id is not None and parent_id not in row_by_node_id
+        }
+
+        self.text_buffer = b"".join(encoded_texts)
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def text(self, row: int) -> str:
+        return self.text_buffer[self.text_offsets[row]:self.text_offsets[row + 1]].decode("utf-8")
+
+    def texts(self) -> list[str]:
+        return [self.text(row) for row in range(len(self))]
+
+    def materialize(self, row: int, score: Optional[float] = None) -> NodeWithScore:
+        """Build a rich node for one row."""
+        relationships = {}
+        doc_code = self.doc_codes[row]
+        if doc_code >= 0:
+            relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(
+                node_id=self.doc_ids[doc_code])
+
+        parent_row = self.parent_rows[row]
+        parent_id = self.node_ids[parent_row] if parent_row >= 0 else self._external_parents.get(row)
+        if parent_id is not None:
+            relationships[NodeRelationship.PARENT] = RelatedNodeInfo(
+                node_id=parent_id)
+
+        start, end = self.char_spans[row]
+        node = TextNode(
+            id_=self.node_ids[row],
+            text=self.text(row),
+            metadata=dict(self.metadatas[self.metadata_codes[row]]),
+            relationships=relationships,
+            start_char_idx=int(start) if start >= 0 else None,
+            end_char_idx=int(end) if end >= 0 else None,
+        )
+        return NodeWithScore(node=node, score=score)
+
+
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+    from llama_index.core.schema import Document
+
+    documents = [
+        Document(text=" ".join(f"word{i}-{j}" for j in range(2000)), metadata={
+            "id": f"job-{i}",
+            "title": f"Job title {i}",
+            "company": f"Company {i % 50}",
+            "tags": ["python", "react", "aws"],
+        })
+        for i in range(500)
+    ]
+
+    tracemalloc.start()
+    nodes = [
+        TextNode(
+            text=document.text[start:start + 512],
+            metadata=dict(document.metadata),
+            relationships={
+                NodeRelationship.SOURCE: document.as_related_node_info()},
+            start_char_idx=start,
+            end_char_idx=start + 512,
+        )
+        for document in documents
+        for start in range(0, len(document.text), 512)
+    ]
+    nodes_memory, _ = tracemalloc.get_traced_memory()
+
+    store = CompactNodeStore(nodes)
+    total_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start_time = time.perf_counter()
+    top_k = [store.materialize(row, score=1.0) for row in range(10)]
+    materialize_elapsed = time.perf_counter() - start_time
+
+    print(f"Nodes: {len(nodes)}")
+    print(f"TextNode list: {nodes_memory / 1e6:.1f}MB")
+    print(f"Compact store: {(total_memory - nodes_memory) / 1e6:.1f}MB")
+    print(f"Materialize top 10: {materialize_elapsed * 1000:.2f}ms")
@@ -0,0 +1,392 @@
+import os
+import re
+import json
+import queue
+import hashlib
+import threading
+from typing import Optional, Sequence
+
+import numpy as np
+import torch
+from jet.logger import logger
+
+
+ONNX_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "onnx")
+ONNX_OPSET_VERSION = 14
+# Threads each session runs its graph with unless told otherwise
+DEFAULT_INTRA_OP_THREADS = 4
+
+
+def get_reranker_runtime() -> str:
+    """Inference runtime of the semantic rerankers: "torch" (default) or "onnx"."""
+    return os.environ.get("RERANKER_RUNTIME", "torch")
+
+
+def available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class _ThreadBudget:
+    """Cores shared by every session pool of the process."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self._available = total
+        self._condition = threading.Condition()
+
+    def acquire(self, threads: int) -> int:
+        threads = min(threads, self.total)
+        with self._condition:
+            self._condition.wait_for(lambda: self._available >= threads)
+            self._available -= threads
+        return threads
+
+    def release(self, threads: int) -> None:
+        with self._condition:
+            self._available += threads
+            self._condition.notify_all()
+
+
+_thread_budget = _ThreadBudget(available_cores())
+
+
+class OnnxSessionPool:
+    """
+    Pool of ONNX Runtime CPU sessions over one model file.
+
+    Each session runs its graph with `intra_op_threads` threads and no
+    inter-op parallelism. A run first takes its threads from a core budget
+    shared by all pools, so the cross-encoder, bi-encoder and monoT5 pools
+    together never run more threads than there are cores.
+    """
+
+    def __init__(self, model_path: str, size: Optional[int] = None, intra_op_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        cores = available_cores()
+        self.intra_op_threads = intra_op_threads or min(
+            DEFAULT_INTRA_OP_THREADS, cores)
+        self.size = size or max(1, cores // self.intra_op_threads)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self._sessions: queue.Queue = queue.Queue()
+        for _ in range(self.size):
+            session = ort.InferenceSession(
+                model_path, options, providers=["CPUExecutionProvider"])
+            self._sessions.put(session)
+        self.input_names = [item.name for item in session.get_inputs()]
+
+    def run(self, feeds: dict[str, np.ndarray]) -> np.ndarray:
+        """Run the first output of the graph on a free session."""
+        threads = _thread_budget.acquire(self.intra_op_threads)
+        session = self._sessions.get()
+        try:
+            return session.run(None, {name: feeds[name] for name in self.input_names})[0]
+        finally:
+            self._sessions.put(session)
+            _thread_budget.release(threads)
+
+
+class _NamedInputs(torch.nn.Module):
+    """Exposes keyword model inputs as the positional inputs ONNX export traces."""
+
+    def __init__(self, graph: torch.nn.Module, input_names: list[str]):
+        super().__init__()
+        self.graph = graph
+        self.input_names = input_names
+
+    def forward(self, *inputs):
+        return self.graph(**dict(zip(self.input_names, inputs)))
+
+
+class _CrossEncoderGraph(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, **inputs):
+        return self.model(**inputs).logits
+
+
+class _BiEncoderGraph(torch.nn.Module):
+    def __init__(self, transformer, cls_pooling: bool = False):
+        super().__init__()
+        self.transformer = transformer
+        self.cls_pooling = cls_pooling
+
+    def forward(self, **inputs):
+        hidden = self.transformer(**inputs).last_hidden_state
+        if self.cls_pooling:
+            return hidden[:, 0]
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+
+
+def graph_fingerprint(graph: torch.nn.Module, input_names: list[str]) -> str:
+    """
+    Hash of what an export depends on: the export settings, the wrapper's
+    own settings, and the model revision or, without one, its weights.
+    """
+    settings = {
+        "opset": ONNX_OPSET_VERSION,
+        "weight_type": "QInt8",
+        "inputs": input_names,
+        "graph": type(graph).__name__,
+        "options": {key: value for key, value in vars(graph).items()
+                    if not key.startswith("_") and isinstance(value, (bool, int, float, str, list))},
+    }
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+
+    revisions = [getattr(module.config, "_commit_hash", None)
+                 for module in graph.modules() if hasattr(module, "config")]
+    if revisions and all(revisions):
+        digest.update(json.dumps(revisions).encode())
+    else:
+        # No hub revision (e.g. local weights): hash the parameters instead
+        with torch.no_grad():
+            for name, tensor in graph.state_dict().items():
+                digest.update(name.encode())
+                digest.update(tensor.detach().cpu().reshape(-1).view(torch.uint8).numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def export_quantized(name: str, graph: torch.nn.Module, sample_inputs: dict[str, torch.Tensor]) -> str:
+    """
+    Export a graph to ONNX and quantize its weights to int8.
+
+    Exports are cached per name and `graph_fingerprint`, so a new model
+    revision, changed weights or export settings produce a new export.
+
+    Returns:
+        str: Path of the quantized model under `ONNX_CACHE_DIR`.
+    """
+    input_names = list(sample_inputs)
+    directory = os.path.join(
+        ONNX_CACHE_DIR, re.sub(r"[^\w.-]+", "_", name), graph_fingerprint(graph, input_names))
+    quantized_path = os.path.join(directory, "model.int8.onnx")
+    if os.path.isfile(quantized_path):
+        return quantized_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(directory, exist_ok=True)
+    float_path = os.path.join(directory, "model.onnx")
+    dynamic_axes = {input_name: {0: "batch", 1: "sequence"}
+                    for input_name in input_names}
+    dynamic_axes["output"] = {0: "batch"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            _NamedInputs(graph, input_names).eval(),
+            tuple(sample_inputs.values()),
+            float_path,
+            input_names=input_names,
+            output_names=["output"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET_VERSION,
+        )
+    quantize_dynamic(float_path, quantized_path, weight_type=QuantType.QInt8)
+    logger.info(f"Exported int8 ONNX model {name} to {quantized_path}")
+    return quantized_path
+
+
+def model_name(model) -> str:
+    return getattr(model.config, "_name_or_path", type(model).__name__)
+
+
+class OnnxCrossEncoder:
+    """
+    Int8 ONNX Runtime replacement for a sentence-transformers `CrossEncoder`.
+
+    Implements `predict(pairs, batch_size)` with the same output, including
+    the sigmoid applied to single-label models.
+    """
+
+    # Sessions are pooled, so callers need not serialize predictions
+    thread_safe = True
+
+    def __init__(self, cross_encoder, pool_size: Optional[int] = None):
+        self.tokenizer = cross_encoder.tokenizer
+        self.max_length = getattr(cross_encoder, "max_length", None) or 512
+        self.num_labels = cross_encoder.model.config.num_labels
+
+        sample = self._tokenize([("query", "document")], "pt")
+        path = export_quantized(
+            f"cross-encoder-{model_name(cross_encoder.model)}",
+            _CrossEncoderGraph(cross_encoder.model.eval()),
+            dict(sample),
+        )
+        self.pool = OnnxSessionPool(path, size=pool_size)
+
+    def _tokenize(self, pairs: Sequence[tuple[str, str]], return_tensors: str):
+        return self.tokenizer(
+            [query for query, _ in pairs],
+            [document for _, document in pairs],
+            padding=True,
+            truncation="longest_first",
+            max_length=self.max_length,
+            return_tensors=return_tensors,
+        )
+
+    def predict(self, pairs: Sequence[tuple[str, str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        logits = [
+            self.pool.run(dict(self._tokenize(pairs[start:start + batch_size], "np")))
+            for start in range(0, len(pairs), batch_size)
+        ]
+        logits = np.concatenate(logits) if logits else np.empty(
+            (0, self.num_labels), dtype=np.float32)
+        if self.num_labels == 1:
+            return 1 / (1 + np.exp(-logits[:, 0]))
+        return logits
+
+
+class OnnxBiEncoder:
+    """
+    Int8 ONNX Runtime replacement for a `SentenceTransformer` encoder.
+
+    The transformer and its pooling (mean or CLS) run in the ONNX graph and
+    `encode(texts, batch_size)` returns a numpy matrix, normalized when the
+    original pipeline ends with a Normalize module.
+    """
+
+    thread_safe = True
+
+    def __init__(self, sentence_transformer, pool_size: Optional[int] = None):
+        transformer = sentence_transformer[0]
+        self.tokenizer = transformer.tokenizer
+        self.max_length = getattr(
+            sentence_transformer, "max_seq_length", None) or 512
+
+        modules = list(sentence_transformer)
+        pooling_config = modules[1].get_config_dict() if len(modules) > 1 else {}
+        self.normalize = any(type(module).__name__ == "Normalize" for module in modules)
+
+        sample = self._tokenize(["query"], "pt")
+        path = export_quantized(
+            f"bi-encoder-{model_name(transformer.auto_model)}",
+            _BiEncoderGraph(transformer.auto_model.eval(),
+                            cls_pooling=bool(pooling_config.get("pooling_mode_cls_token"))),
+            dict(sample),
+        )
+        self.pool = OnnxSessionPool(path, size=pool_size)
+
+    def _tokenize(self, texts: Sequence[str], return_tensors: str):
+        return self.tokenizer(
+            list(texts),
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors=return_tensors,
+        )
+
+    def encode(self, texts: str | Sequence[str], batch_size: int = 64, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        # Sort by length so each batch pads to similar lengths
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        embeddings = None
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            output = self.pool.run(
+                dict(self._tokenize([texts[idx] for idx in batch], "np")))
+            if embeddings is None:
+                embeddings = np.empty(
+                    (len(texts), output.shape[1]), dtype=np.float32)
+            embeddings[batch] = output
+        if embeddings is None:
+            return np.empty((0, 0), dtype=np.float32)
+        if self.normalize:
+            embeddings /= np.maximum(np.linalg.norm(embeddings,
+                                     axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+if __name__ == "__main__":
+    import time
+    from jet.vectors.helpers import setup_bert_model, setup_colbert_model, setup_t5_model
+    from routes.rerankers.monot5 import MonoT5Scorer, OnnxMonoT5Scorer
+
+    queries = [
+        "React Native mobile developer",
+        "Senior Python backend engineer",
+        "AWS cloud infrastructure",
+        "Machine learning with PyTorch",
+    ]
+    skills = ["React Native", "Python", "Django", "AWS", "Kubernetes", "PyTorch",
+              "TypeScript", "PostgreSQL", "Node.js", "GraphQL", "Terraform", "Swift"]
+    documents = [
+        f"Looking for a {level} engineer with {skills[i % len(skills)]} and "
+        f"{skills[(i * 7 + 3) % len(skills)]} experience to build {product}."
+        for i, (level, product) in enumerate(
+            (level, product)
+            for level in ["junior", "mid-level", "senior", "lead"]
+            for product in ["mobile apps", "data pipelines", "web platforms",
+                            "internal tools", "cloud services", "ML models",
+                            "payment systems", "APIs", "dashboards", "SDKs"]
+            for _ in range(5)
+        )
+    ]
+
+    def timed(fn):
+        start_time = time.perf_counter()
+        result = fn()
+        return result, time.perf_counter() - start_time
+
+    def spearman(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.corrcoef(a.argsort().argsort(), b.argsort().argsort())[0, 1])
+
+    def report(name: str, reference: np.ndarray, candidate: np.ndarray, reference_time: float, candidate_time: float, top_k: int = 10):
+        overlap = np.mean([
+            len(set(np.argsort(-ref)[:top_k]) & set(np.argsort(-cand)[:top_k])) / top_k
+            for ref, cand in zip(reference, candidate)
+        ])
+        correlation = np.mean([spearman(ref, cand)
+                               for ref, cand in zip(reference, candidate)])
+        print(
+            f"{name:14s} torch={reference_time * 1000:8.1f}ms onnx-int8={candidate_time * 1000:8.1f}ms "
+            f"speedup={reference_time / candidate_time:5.2f}x "
+            f"max_abs_diff={np.abs(reference - candidate).max():.4f} "
+            f"spearman={correlation:.4f} top{top_k}_overlap={overlap:.2f}")
+
+    print(f"{len(queries)} queries x {len(documents)} documents, {available_cores()} cores")
+
+    cross_encoder = setup_bert_model()
+    onnx_cross_encoder = OnnxCrossEncoder(cross_encoder)
+    pairs = [(query, document) for query in queries for document in documents]
+    reference, reference_time = timed(
+        lambda: np.asarray(cross_encoder.predict(pairs, batch_size=32)))
+    candidate, candidate_time = timed(
+        lambda: onnx_cross_encoder.predict(pairs, batch_size=32))
+    report("cross-encoder", reference.reshape(len(queries), -1),
+           candidate.reshape(len(queries), -1), reference_time, candidate_time)
+
+    bi_encoder = setup_colbert_model()
+    onnx_bi_encoder = OnnxBiEncoder(bi_encoder)
+
+    def bi_encoder_scores(model) -> np.ndarray:
+        embeddings = np.asarray(model.encode(
+            queries + documents, batch_size=64, convert_to_numpy=True), dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings[:len(queries)] @ embeddings[len(queries):].T
+
+    reference, reference_time = timed(lambda: bi_encoder_scores(bi_encoder))
+    candidate, candidate_time = timed(
+        lambda: bi_encoder_scores(onnx_bi_encoder))
+    report("bi-encoder", reference, candidate, reference_time, candidate_time)
+
+    t5_model, t5_tokenizer = setup_t5_model()
+    t5_scorer = MonoT5Scorer(t5_model, t5_tokenizer)
+    onnx_t5_scorer = OnnxMonoT5Scorer(t5_model, t5_tokenizer)
+    reference, reference_time = timed(lambda: np.stack(
+        [t5_scorer.score(query, documents) for query in queries]))
+    candidate, candidate_time = timed(lambda: np.stack(
+        [onnx_t5_scorer.score(query, documents) for query in queries]))
+    report("monoT5", reference, candidate, reference_time, candidate_time)
@@ -0,0 +1,136 @@
+from typing import Literal, Optional
+
+import numpy as np
+
+
+EmbeddingDtype = Literal["float32", "float16", "int8"]
+
+
+class QuantizedEmbeddings:
+    """
+    Embedding matrix stored in float32, float16 or int8 with per-vector scales.
+
+    Scores are computed block by block, upcasting one block at a time to
+    float32 so the matrix product runs on BLAS while the temporary memory
+    stays bounded by `block_size` rows. When a full precision copy is
+    available (typically a read-only memmap of the persisted float32
+    matrix), the best approximate candidates can be rescored exactly.
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        scales: Optional[np.ndarray] = None,
+        full_precision: Optional[np.ndarray] = None,
+        block_size: int = 8192,
+    ):
+        self.data = data
+        self.scales = scales
+        self.full_precision = full_precision
+        self.block_size = block_size
+
+    @classmethod
+    def quantize(
+        cls,
+        embeddings: np.ndarray,
+        dtype: EmbeddingDtype = "float32",
+        full_precision: Optional[np.ndarray] = None,
+        block_size: int = 8192,
+    ) -> "QuantizedEmbeddings":
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if dtype == "float32":
+            return cls(embeddings, block_size=block_size)
+        if dtype == "float16":
+            return cls(embeddings.astype(np.float16), full_precision=full_precision, block_size=block_size)
+        if dtype == "int8":
+            scales = np.abs(embeddings).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            data = np.round(embeddings / scales[:, None]).astype(np.int8)
+            return cls(data, scales=scales.astype(np.float32), full_precision=full_precision, block_size=block_size)
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+    @property
+    def dtype(self) -> str:
+        return self.data.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @property
+    def can_rescore(self) -> bool:
+        """Whether approximate scores can be rescored in full precision."""
+        return self.full_precision is not None and self.data.dtype != np.float32
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def scores(self, queries: np.ndarray, rescore_top_k: int = 0) -> np.ndarray:
+        """
+        Dot-product scores of every stored vector against one or more queries.
+
+        Args:
+            queries (np.ndarray): A (dim,) query or a (num_queries, dim) matrix.
+            rescore_top_k (int): Number of best approximate candidates per
+                query to rescore with the full precision vectors. Ignored
+                unless `can_rescore`.
+
+        Returns:
+            np.ndarray: (num_vectors,) or (num_queries, num_vectors) scores.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+
+        scores = np.empty((len(queries), len(self.data)), dtype=np.float32)
+        for start in range(0, len(self.data), self.block_size):
+            block = self.data[start:start + self.block_size].astype(np.float32)
+            block_scores = queries @ block.T
+            if self.scales is not None:
+                block_scores *= self.scales[start:start + self.block_size]
+            scores[:, start:start + self.block_size] = block_scores
+
+        if rescore_top_k and self.can_rescore:
+            rescore_top_k = min(rescore_top_k, len(self.data))
+            candidates = np.argpartition(-scores, rescore_top_k - 1, axis=1)[:, :rescore_top_k]
+            for row, row_candidates in enumerate(candidates):
+                ordered = np.sort(row_candidates)
+                scores[row, ordered] = np.asarray(
+                    self.full_precision[ordered], dtype=np.float32) @ queries[row]
+
+        return scores[0] if single else scores
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    num_vectors, dim, num_queries, top_k = 20000, 768, 200, 10
+
+    centers = rng.normal(size=(200, dim)).astype(np.float32)
+    embeddings = centers[rng.integers(0, len(centers), num_vectors)] + \
+        0.5 * rng.normal(size=(num_vectors, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries = embeddings[rng.integers(0, num_vectors, num_queries)] + \
+        0.1 * rng.normal(size=(num_queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact = np.argsort(-(queries @ embeddings.T), axis=1)[:, :top_k]
+
+    for dtype in ["float32", "float16", "int8"]:
+        for rescore_top_k in [0, 4 * top_k]:
+            if dtype == "float32" and rescore_top_k:
+                continue
+            store = QuantizedEmbeddings.quantize(
+                embeddings, dtype=dtype, full_precision=embeddings)
+            start_time = time.perf_counter()
+            scores = store.scores(queries, rescore_top_k=rescore_top_k)
+            elapsed = time.perf_counter() - start_time
+            approx = np.argsort(-scores, axis=1)[:, :top_k]
+            recall = np.mean([len(set(a) & set(e)) / top_k
+                              for a, e in zip(approx, exact)])
+            print(
+                f"{dtype:8s} rescore={rescore_top_k:3d} "
+                f"memory={store.nbytes / 1e6:6.1f}MB "
+                f"recall@{top_k}={recall:.4f} "
+                f"time={elapsed * 1000:.1f}ms")
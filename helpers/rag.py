@@ -1,30 +1,45 @@
+import copy
+import os
 import threading
-from typing import Callable, Generator, Literal, Optional
-from jet.file.utils import get_file_last_modified, load_file
+from typing import Any, Callable, Generator, Iterable, Literal, Optional
+from jet.file.utils import get_file_last_modified
 from jet.logger import logger
 from jet.memory.lru_cache import LRUCache
 from jet.transformers.object import make_serializable
-from llama_index.core.schema import Document
+from llama_index.core.schema import Document, NodeWithScore, TextNode
 # from jet.llm.ollama.constants import OLLAMA_SMALL_EMBED_MODEL
 # from jet.llm.ollama.models import OLLAMA_EMBED_MODELS, OLLAMA_MODEL_NAMES
 from jet.llm.ollama.base import initialize_ollama_settings
 from jet.llm.query.retrievers import load_documents, query_llm, setup_index, setup_semantic_search
+from helpers.corpus_cache import get_corpus
+from helpers.context_dedup import dedupe_contexts, dedupe_nodes
+from helpers.context_packing import DEFAULT_RESERVED_OUTPUT_TOKENS, PackingReport, get_context_window, pack_contexts
+from helpers.hybrid_search import setup_hybrid_search
+from helpers.ingest import can_ingest_parallel, iter_documents_parallel, load_documents_parallel
+from helpers.rag_reranker import get_reranker
+from helpers.retrieval_cache import RetrievalCache
+from helpers.semantic_cache import SemanticAnswerCache, hash_contexts, replay_answer
 
 
 _active_search_documents = LRUCache(max_size=1)
 
 
-def remove_substrings(contexts: list[str]) -> list[str]:
-    # Sort by length to ensure that substrings are checked after the longer strings
-    contexts.sort(key=len, reverse=True)
+def copy_result(result: dict) -> dict:
+    """
+    Copy a retrieval result so callers never share node dicts with the
+    results cache. Unpopulated nodes (NodeWithScore) are not mutated and
+    are shared.
+    """
+    return {
+        **result,
+        "nodes": [copy.deepcopy(node) if isinstance(node, dict) else node
+                  for node in result["nodes"]],
+    }
 
-    result = []
-    for context in contexts:
-        # Add the context to result if it's not a substring of any existing item
-        if not any(context in other for other in result):
-            result.append(context)
 
-    return result
+def remove_substrings(contexts: list[str]) -> list[str]:
+    # Longest first; contexts contained in a kept context are dropped
+    return dedupe_contexts(contexts)
 
 
 class RAG:
@@ -59,10 +74,20 @@ class RAG:
         self.last_modified: Optional[float] = None
         self.query_nodes: Optional[Callable] = None
 
+        # Bumped whenever the index is rebuilt so cached results go stale
+        self.index_version: int = 0
+        # Source records by id, parsed once per index load for metadata merging
+        self.base_data_dict: dict[str, dict] = {}
+        self.results_cache = RetrievalCache()
+        self.answer_cache = SemanticAnswerCache(self.embed_model)
+        # Retrievals may run concurrently; only one of them may reload the index
+        self._load_lock = threading.Lock()
+
         self._check_documents_cache()
 
     def _check_documents_cache(self):
-        self.documents = self._load_documents()
+        with self._load_lock:
+            self.documents = self._load_documents()
 
     def _load_documents(self) -> list[Document]:
         global _active_search_documents
@@ -76,10 +101,37 @@ class RAG:
                     logger.debug("Creating document embeddings from file...")
                 else:
                     logger.warning("File has changed, reloading index...")
-                documents = load_documents(
-                    self.path_or_docs, **self.setup_args)
+                parallel_ingest = self.setup_args.get("parallel_ingest")
+                if parallel_ingest and not can_ingest_parallel(self.path_or_docs, **self.setup_args):
+                    logger.warning(
+                        "parallel_ingest only supports text directories without hierarchy splits; loading sequentially")
+                    parallel_ingest = False
+
+                if parallel_ingest and self.mode == "hybrid":
+                    # Files are indexed as they are parsed instead of after the whole tree
+                    documents = []
+                    self._setup_query_callback(documents, file_documents=iter_documents_parallel(
+                        self.path_or_docs,
+                        self.setup_args.get("extensions"),
+                        split_mode=self.setup_args.get("split_mode") or [],
+                        max_workers=self.setup_args.get("ingest_workers"),
+                    ))
+                else:
+                    if parallel_ingest:
+                        documents = load_documents_parallel(
+                            self.path_or_docs,
+                            max_workers=self.setup_args.get("ingest_workers"),
+                            **self.setup_args,
+                        )
+                    else:
+                        documents = load_documents(
+                            self.path_or_docs, **self.setup_args)
+                    self._setup_query_callback(documents)
 
-                self._setup_query_callback(documents)
+                self.base_data_dict = self._load_base_data()
+                if self.mode == "hybrid":
+                    # The hybrid retriever keeps its own compact copy of the texts
+                    documents = []
 
                 self.last_modified = current_modified
                 _active_search_documents.put(
@@ -92,13 +144,25 @@ class RAG:
             documents = self.path_or_docs
         return documents
 
-    def _setup_query_callback(self, documents: list[Document]):
+    def _load_base_data(self) -> dict[str, dict]:
+        if not os.path.isfile(self.path_or_docs):
+            return {}
+
+        return get_corpus(self.path_or_docs).id_map
+
+    def _setup_query_callback(self, documents: list[Document], **kwargs):
         if self.mode in ["faiss", "graph_nx"]:
             self.query_nodes = setup_semantic_search(
                 documents,
                 mode=self.mode,
                 **self.setup_args,
             )
+        elif self.mode == "hybrid":
+            self.query_nodes = setup_hybrid_search(
+                documents,
+                **self.setup_args,
+                **kwargs,
+            )
         else:
             self.query_nodes = setup_index(
                 documents,
@@ -106,22 +170,219 @@ class RAG:
                 **self.setup_args,
             )
 
-    def query(self, query: str, contexts: list[str] = [], system: Optional[str] = None, stop_event: Optional[threading.Event] = None, **kwargs) -> str | Generator[str, None, None]:
-        from llama_index.core.retrievers.fusion_retriever import FUSION_MODES
+        self.index_version += 1
+        self.results_cache.clear()
+        # Every cached answer is bucketed on the previous index version
+        self.answer_cache.purge()
+
+    def _query_nodes(
+        self,
+        query: str,
+        rerank: bool = False,
+        rerank_candidates: Optional[int] = None,
+        rerank_latency_budget: Optional[float] = None,
+        **options,
+    ) -> dict:
+        """
+        Run first-stage retrieval, optionally followed by cross-encoder reranking.
+
+        With `rerank`, `rerank_candidates` nodes (default 4x top_k) are
+        retrieved, reranked in one batched pass and trimmed back to top_k.
+        """
+        if not rerank:
+            return self.query_nodes(query=query, **options)
+
+        top_k = options.get("top_k")
+        candidates = rerank_candidates or (top_k * 4 if top_k else None)
+        result = self.query_nodes(
+            query=query, **{**options, "top_k": candidates})
+
+        nodes = get_reranker().rerank(
+            query, result["nodes"], top_k=top_k, latency_budget=rerank_latency_budget)
+        return {
+            **result,
+            "nodes": nodes,
+            "texts": [node.text for node in nodes],
+        }
+
+    def _retrieve_nodes(self, query: str, **kwargs) -> list[NodeWithScore]:
+        near_duplicate_threshold = kwargs.pop("near_duplicate_threshold", None)
 
+        options = {
+            "query": query,
+            **self.setup_args,
+            **kwargs,
+        }
+        result = self._query_nodes(**options)
+        if result.get("nodes"):
+            return dedupe_nodes(
+                result["nodes"], near_duplicate_threshold=near_duplicate_threshold)
+
+        texts = dedupe_contexts(
+            result['texts'], near_duplicate_threshold=near_duplicate_threshold)
+        return [NodeWithScore(node=TextNode(text=text)) for text in texts]
+
+    def _get_context_nodes(self, query: str, contexts: list[str], system: Optional[str], context_window: Optional[int], reserved_output_tokens: int, **kwargs) -> tuple[list[NodeWithScore], Optional[PackingReport]]:
+        # Contexts passed by the caller are used as given
+        if contexts:
+            return [NodeWithScore(node=TextNode(text=context)) for context in contexts], None
+
+        nodes = self._retrieve_nodes(query, **kwargs)
+
+        context_window = context_window or get_context_window(self.model)
+        packed_nodes, report = pack_contexts(
+            nodes,
+            model=self.model,
+            query=query,
+            system=system,
+            context_window=context_window,
+            reserved_output_tokens=reserved_output_tokens,
+        )
+        if report["dropped"]:
+            logger.warning(
+                f"Dropped {report['dropped']} contexts ({report['dropped_tokens']} tokens) to fit {report['budget']} token budget")
+        return packed_nodes, report
+
+    def _answer_cache_bucket(self, contexts: list[str], system: Optional[str], **kwargs) -> tuple:
+        return (
+            self.model,
+            system,
+            hash_contexts(contexts),
+            self.index_version,
+            RetrievalCache.make_key("", 0, **kwargs),
+        )
+
+    def query(
+        self,
+        query: str,
+        contexts: list[str] = [],
+        system: Optional[str] = None,
+        stop_event: Optional[threading.Event] = None,
+        context_window: Optional[int] = None,
+        reserved_output_tokens: int = DEFAULT_RESERVED_OUTPUT_TOKENS,
+        semantic_cache_threshold: Optional[float] = None,
+        **kwargs,
+    ) -> str | Generator[str, None, None]:
         self._check_documents_cache()
 
-        if not contexts:
-            options = {
-                "query": query,
-                **self.setup_args,
-                **kwargs,
+        if semantic_cache_threshold is not None:
+            query_embedding = self.answer_cache.embed(query)
+            bucket = self._answer_cache_bucket(contexts, system, **kwargs)
+            cached = self.answer_cache.lookup(
+                query_embedding, bucket, semantic_cache_threshold)
+            if cached is not None:
+                logger.info("Serving answer from semantic cache")
+                yield from replay_answer(cached["response"])
+                return
+
+        nodes, _ = self._get_context_nodes(
+            query, contexts, system, context_window, reserved_output_tokens, **kwargs)
+        packed_contexts = [node.text for node in nodes]
+
+        response = ""
+        for chunk in query_llm(query, packed_contexts, model=self.model, system=system, stop_event=stop_event):
+            response += chunk
+            yield chunk
+
+        if semantic_cache_threshold is not None and not (stop_event and stop_event.is_set()):
+            self.answer_cache.add(query_embedding, bucket, {
+                "response": response,
+                "sources": [{"id": node.node_id, "score": node.score, "text": node.text, "metadata": node.metadata} for node in nodes],
+            })
+
+    def stream_query(
+        self,
+        query: str,
+        contexts: list[str] = [],
+        system: Optional[str] = None,
+        stop_event: Optional[threading.Event] = None,
+        initial_top_k: int = 3,
+        refine: bool = False,
+        context_window: Optional[int] = None,
+        reserved_output_tokens: int = DEFAULT_RESERVED_OUTPUT_TOKENS,
+        semantic_cache_threshold: Optional[float] = None,
+        **kwargs,
+    ) -> Generator[tuple[str, Any], None, None]:
+        """
+        Answer a query while streaming typed events.
+
+        Yields ("sources", list[dict]) as soon as retrieval finishes, then
+        ("token", str) chunks, and finally ("done", dict). With `refine`, the
+        first pass only uses the `initial_top_k` best contexts so generation
+        starts with a short prefill; the remaining contexts are applied in a
+        second pass announced by a ("refine", dict) event. Answers found in
+        the semantic cache are replayed with "cached" set in the done event.
+        """
+        self._check_documents_cache()
+
+        if semantic_cache_threshold is not None:
+            query_embedding = self.answer_cache.embed(query)
+            bucket = self._answer_cache_bucket(contexts, system, **kwargs)
+            cached = self.answer_cache.lookup(
+                query_embedding, bucket, semantic_cache_threshold)
+            if cached is not None:
+                yield "sources", cached["sources"]
+                for chunk in replay_answer(cached["response"]):
+                    yield "token", chunk
+                yield "done", {"cached": True, "response": cached["response"]}
+                return
+
+        nodes, packing = self._get_context_nodes(
+            query, contexts, system, context_window, reserved_output_tokens, **kwargs)
+        contexts = [node.text for node in nodes]
+        sources = [
+            {
+                "id": node.node_id,
+                "score": node.score,
+                "text": node.text,
+                "metadata": node.metadata,
             }
-            result = self.query_nodes(**options)
-            contexts = result['texts']
-            contexts = remove_substrings(contexts)
+            for node in nodes
+        ]
 
-        yield from query_llm(query, contexts, model=self.model, system=system, stop_event=stop_event)
+        yield "sources", sources
+
+        if refine:
+            initial_contexts = contexts[:initial_top_k]
+            late_contexts = contexts[initial_top_k:]
+        else:
+            initial_contexts = contexts
+            late_contexts = []
+
+        response = ""
+        for chunk in query_llm(query, initial_contexts, model=self.model, system=system, stop_event=stop_event):
+            response += chunk
+            yield "token", chunk
+
+        passes = 1
+        if late_contexts and not (stop_event and stop_event.is_set()):
+            passes += 1
+            yield "refine", {"contexts": len(late_contexts)}
+
+            refine_query = (
+                f"{query}\n\n"
+                f"Existing answer:\n{response}\n\n"
+                "Refine the existing answer with the new context only if it adds relevant "
+                "information; otherwise repeat the existing answer."
+            )
+            response = ""
+            for chunk in query_llm(refine_query, late_contexts, model=self.model, system=system, stop_event=stop_event):
+                response += chunk
+                yield "token", chunk
+
+        if semantic_cache_threshold is not None and not (stop_event and stop_event.is_set()):
+            self.answer_cache.add(query_embedding, bucket, {
+                "response": response,
+                "sources": sources,
+            })
+
+        yield "done", {
+            "cached": False,
+            "passes": passes,
+            "contexts": len(contexts),
+            "packing": packing,
+            "response": response,
+        }
 
     def get_results(self, query: str, **kwargs) -> str | Generator[str, None, None]:
         from llama_index.core.retrievers.fusion_retriever import FUSION_MODES
@@ -134,25 +395,107 @@ class RAG:
             **kwargs,
         }
 
-        result = self.query_nodes(**options)
+        cache_key = self.results_cache.make_key(
+            query, self.index_version, **{k: v for k, v in options.items() if k != "query"})
+        result = self.results_cache.get(cache_key)
+        if result is None:
+            result = self._compute_results(cache_key, options)
 
+        return copy_result(result)
+
+    def _compute_results(self, cache_key: str, options: dict) -> dict:
+        """Run retrieval for a cache miss and store a private copy of the result."""
+        result = self._populate_metadata(self._query_nodes(**options))
+        self.results_cache.put(cache_key, copy_result(result))
+        return result
+
+    def get_results_batch(self, queries: list[str], **kwargs) -> list[dict]:
+        """
+        Retrieve results for many queries at once.
+
+        Cached queries are served from the results cache. When the query
+        callback supports batching (hybrid mode) and no rerank stage is
+        requested, the remaining queries are scored together; otherwise they
+        fall back to `get_results` one by one.
+        """
+        self._check_documents_cache()
+
+        options = {
+            **self.setup_args,
+            **kwargs,
+        }
+        cache_keys = [
+            self.results_cache.make_key(query, self.index_version, **options)
+            for query in queries
+        ]
+        results: list[Optional[dict]] = [
+            self.results_cache.get(key) for key in cache_keys]
+        missing = [idx for idx, result in enumerate(results) if result is None]
+
+        batch_query_nodes = getattr(self.query_nodes, "batch", None)
+        if missing and batch_query_nodes and not options.get("rerank"):
+            batch_results = batch_query_nodes(
+                [queries[idx] for idx in missing], **options)
+            for idx, result in zip(missing, batch_results):
+                results[idx] = self._populate_metadata(result)
+                self.results_cache.put(cache_keys[idx], copy_result(results[idx]))
+        else:
+            # Misses were already counted by the lookups above
+            for idx in missing:
+                results[idx] = self._compute_results(
+                    cache_keys[idx], {"query": queries[idx], **options})
+
+        return [copy_result(result) for result in results]
+
+    def _populate_metadata(self, result: dict) -> dict:
         # Populate metadata with all attributes
         if isinstance(self.path_or_docs, str):
-            base_data = load_file(self.path_or_docs) or []
-            base_data_dict = {d["id"]: d for d in base_data}
-            for idx, node in enumerate(result["nodes"]):
-                node_dict = make_serializable(node)
+            for idx, item in enumerate(result["nodes"]):
+                node = item.node
                 result["nodes"][idx] = {
                     "id": node.node_id,
-                    "score": node.score,
+                    "score": item.score,
                     "text": node.text,
                     "metadata": {
-                        **node_dict["node"]["metadata"],
-                        **base_data_dict[node_dict["node"]["metadata"]["id"]]
+                        **node.metadata,
+                        **self.base_data_dict.get(node.metadata.get("id"), {})
                     },
-                    "relationships": node_dict["node"]["relationships"],
-                    "start_char_idx": node_dict["node"]["start_char_idx"],
-                    "end_char_idx": node_dict["node"]["end_char_idx"],
+                    "relationships": {
+                        key.value: make_serializable(info)
+                        for key, info in node.relationships.items()
+                    },
+                    "start_char_idx": node.start_char_idx,
+                    "end_char_idx": node.end_char_idx,
                 }
 
         return result
+
+    def warm_cache(self, queries: Iterable[str | dict[str, Any]], **kwargs) -> int:
+        """
+        Populate the results cache from a query log.
+
+        Args:
+            queries: Query strings, or dicts with a "query" key and optional
+                per-query overrides (top_k, score_threshold, ...).
+            **kwargs: Retrieval options shared by all queries.
+
+        Returns:
+            int: Number of queries that were executed.
+        """
+        count = 0
+        for entry in queries:
+            if isinstance(entry, dict):
+                entry = entry.copy()
+                query = entry.pop("query", None)
+                options = {**kwargs, **entry}
+            else:
+                query = entry
+                options = kwargs
+            if not query:
+                continue
+            self.get_results(query, **options)
+            count += 1
+
+        logger.info(
+            f"Warmed results cache with {count} queries: {self.results_cache.stats()}")
+        return count
@@ -0,0 +1,146 @@
+import os
+import time
+import threading
+from contextlib import nullcontext
+from typing import Generator, Optional, Sequence
+
+import numpy as np
+from jet.logger import logger
+from jet.vectors.helpers import setup_bert_model
+from llama_index.core.schema import NodeWithScore
+
+from helpers.onnx_runtime import OnnxCrossEncoder, get_reranker_runtime
+from helpers.retrieval_cache import RetrievalCache
+
+
+class CrossEncoderReranker:
+    """
+    Reranks retrieved nodes with a resident cross-encoder.
+
+    Scores are cached per (query, text) pair, so only unseen pairs go through
+    the model. Those are sorted by length and predicted in micro-batches of
+    `batch_size`, which keeps padding (and memory) low and lets concurrent
+    requests interleave between batches. The observed time per pair is
+    tracked to skip reranking when a request would exceed its latency budget.
+    """
+
+    def __init__(self, batch_size: int = 32, chunk_size: int = 1024, cache_size: int = 20000):
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.scores_cache = RetrievalCache(max_size=cache_size)
+        self.seconds_per_pair: Optional[float] = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            model = setup_bert_model()
+            if get_reranker_runtime() == "onnx":
+                model = OnnxCrossEncoder(model)
+            self._model = model
+        return self._model
+
+    def estimate_seconds(self, num_pairs: int) -> float:
+        if self.seconds_per_pair is None:
+            return 0.0
+        return num_pairs * self.seconds_per_pair
+
+    def score(self, query: str, texts: Sequence[str]) -> list[float]:
+        scores: list[Optional[float]] = [
+            self.scores_cache.get((query, text)) for text in texts]
+        missing = [idx for idx, score in enumerate(scores) if score is None]
+
+        if missing:
+            start_time = time.perf_counter()
+            predicted = self._predict(query, [texts[idx] for idx in missing])
+            elapsed = time.perf_counter() - start_time
+
+            per_pair = elapsed / len(missing)
+            self.seconds_per_pair = per_pair if self.seconds_per_pair is None else (
+                0.8 * self.seconds_per_pair + 0.2 * per_pair)
+
+            for idx, score in zip(missing, predicted):
+                scores[idx] = float(score)
+                self.scores_cache.put((query, texts[idx]), scores[idx])
+
+        return scores
+
+    def _predict(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        """Predict pairs in length-bucketed micro-batches."""
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        scores = np.empty(len(texts), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            # The model is shared; serialize forward passes unless it pools sessions
+            with nullcontext() if getattr(self.model, "thread_safe", False) else self._lock:
+                scores[batch] = self.model.predict(
+                    [(query, texts[idx]) for idx in batch], batch_size=self.batch_size)
+        return scores
+
+    def iter_scores(
+        self,
+        queries: Sequence[str],
+        texts: Sequence[str],
+    ) -> Generator[tuple[int, np.ndarray, np.ndarray], None, None]:
+        """
+        Score every text against every query, `chunk_size` texts at a time.
+
+        Texts are visited in length order, so only one chunk of pairs is held
+        in memory and each chunk pads to similar lengths.
+
+        Yields:
+            tuple[int, np.ndarray, np.ndarray]: The query index, the indices
+                of the scored texts and their scores.
+        """
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        for query_idx, query in enumerate(queries):
+            for start in range(0, len(order), self.chunk_size):
+                chunk = order[start:start + self.chunk_size]
+                scores = self.score(query, [texts[idx] for idx in chunk])
+                yield query_idx, chunk, np.asarray(scores, dtype=np.float32)
+
+    def rerank(
+        self,
+        query: str,
+        nodes: Sequence[NodeWithScore],
+        top_k: Optional[int] = None,
+        latency_budget: Optional[float] = None,
+    ) -> list[NodeWithScore]:
+        """
+        Rerank nodes by cross-encoder score and keep the best top_k.
+
+        When the estimated scoring time for uncached pairs exceeds
+        `latency_budget` seconds, the first-stage ranking is kept instead.
+        """
+        top_k = top_k or len(nodes)
+        texts = [item.node.get_content() for item in nodes]
+
+        if latency_budget is not None:
+            uncached = sum(
+                1 for text in texts if (query, text) not in self.scores_cache)
+            estimate = self.estimate_seconds(uncached)
+            if estimate > latency_budget:
+                logger.warning(
+                    f"Skipping rerank: estimated {estimate:.2f}s exceeds {latency_budget:.2f}s budget")
+                return list(nodes[:top_k])
+
+        scores = self.score(query, texts)
+        reranked = [
+            NodeWithScore(node=item.node, score=score)
+            for item, score in zip(nodes, scores)
+        ]
+        reranked.sort(key=lambda item: item.score, reverse=True)
+        return reranked[:top_k]
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+
+
+def get_reranker() -> CrossEncoderReranker:
+    global _reranker
+
+    if _reranker is None:
+        _reranker = CrossEncoderReranker(
+            batch_size=int(os.environ.get("RERANKER_BATCH_SIZE", "32")))
+    return _reranker
@@ -0,0 +1,79 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class RetrievalCache:
+    """
+    LRU cache of retrieval results keyed on query parameters and an index version.
+
+    Entries are never invalidated by time; callers include the current index
+    version in the key, so results computed against an older index can never
+    be served once the version is bumped.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, index_version: int, **params: Any) -> str:
+        """
+        Build a cache key from the query, index version and retrieval parameters.
+
+        Args:
+            query (str): The search query.
+            index_version (int): Version of the index the results come from.
+            **params: Retrieval options (top_k, mode, score_threshold, ...).
+
+        Returns:
+            str: A SHA256 hash of the serialized arguments.
+        """
+        concatenated = json.dumps(
+            [query, index_version, params],
+            sort_keys=True,
+            separators=(',', ':'),
+            default=str,
+        )
+        return hashlib.sha256(concatenated.encode()).hexdigest()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,156 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Generator, Hashable, Optional
+
+import numpy as np
+
+from helpers.embedding_scheduler import get_scheduled_embedding_function
+
+
+def hash_contexts(contexts: list[str]) -> str:
+    return hashlib.sha256("\x00".join(contexts).encode()).hexdigest() if contexts else ""
+
+
+class _EntryRing:
+    """
+    Ring buffer of normalized query embeddings and their payloads.
+
+    The buffer starts small and doubles up to `max_capacity`, so appends are
+    amortized O(1) instead of copying the whole matrix on every insert.
+    """
+
+    def __init__(self, dim: int, max_capacity: int, capacity: int = 16):
+        self.max_capacity = max_capacity
+        capacity = min(capacity, max_capacity)
+        self.embeddings = np.zeros((capacity, dim), dtype=np.float32)
+        self.valid = np.zeros(capacity, dtype=bool)
+        self.payloads: list[Any] = [None] * capacity
+        self.start = 0
+        self.count = 0
+
+    def append(self, embedding: np.ndarray, payload: Any) -> bool:
+        """Add an entry; returns True when the oldest entry was overwritten."""
+        capacity = len(self.payloads)
+        if self.count == capacity and capacity < self.max_capacity:
+            self._grow(min(capacity * 2, self.max_capacity))
+            capacity = len(self.payloads)
+
+        overwritten = self.count == capacity
+        if overwritten:
+            self.popleft()
+        slot = (self.start + self.count) % capacity
+        self.embeddings[slot] = embedding
+        self.valid[slot] = True
+        self.payloads[slot] = payload
+        self.count += 1
+        return overwritten
+
+    def popleft(self) -> None:
+        self.valid[self.start] = False
+        self.payloads[self.start] = None
+        self.start = (self.start + 1) % len(self.payloads)
+        self.count -= 1
+
+    def best(self, embedding: np.ndarray) -> tuple[float, Any]:
+        similarities = np.where(self.valid, self.embeddings @ embedding, -np.inf)
+        best = int(np.argmax(similarities))
+        return float(similarities[best]), self.payloads[best]
+
+    def _grow(self, capacity: int) -> None:
+        order = (self.start + np.arange(self.count)) % len(self.payloads)
+        embeddings = np.zeros((capacity, self.embeddings.shape[1]), dtype=np.float32)
+        embeddings[:self.count] = self.embeddings[order]
+        valid = np.zeros(capacity, dtype=bool)
+        valid[:self.count] = True
+        self.payloads = [self.payloads[idx] for idx in order] + \
+            [None] * (capacity - self.count)
+        self.embeddings = embeddings
+        self.valid = valid
+        self.start = 0
+
+
+class SemanticAnswerCache:
+    """
+    Cache of final answers looked up by query embedding similarity.
+
+    Entries are grouped into buckets by everything that must match exactly
+    (model, system prompt, explicit contexts and index version). Within a
+    bucket, the cached query with the highest cosine similarity is returned
+    when it reaches the threshold, so paraphrases of the same question share
+    an answer. Past `max_entries`, the oldest entry of the least recently
+    used bucket is evicted.
+    """
+
+    def __init__(self, embed_model: str, max_entries: int = 1000):
+        self.embed_model = embed_model
+        self.max_entries = max_entries
+        self.lookups = 0
+        self.hits = 0
+        self._buckets: OrderedDict[Hashable, _EntryRing] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._embed_func = None
+
+    def embed(self, query: str) -> np.ndarray:
+        if self._embed_func is None:
+            self._embed_func = get_scheduled_embedding_function(
+                self.embed_model)
+        embedding = np.asarray(self._embed_func(query), dtype=np.float32)
+        return embedding / max(np.linalg.norm(embedding), 1e-12)
+
+    def lookup(self, embedding: np.ndarray, bucket: Hashable, threshold: float) -> Optional[Any]:
+        with self._lock:
+            self.lookups += 1
+            entries = self._buckets.get(bucket)
+            if entries is None:
+                return None
+
+            similarity, payload = entries.best(embedding)
+            if similarity < threshold:
+                return None
+
+            self.hits += 1
+            self._buckets.move_to_end(bucket)
+            return payload
+
+    def add(self, embedding: np.ndarray, bucket: Hashable, payload: Any) -> None:
+        with self._lock:
+            entries = self._buckets.get(bucket)
+            if entries is None:
+                entries = self._buckets[bucket] = _EntryRing(
+                    len(embedding), self.max_entries)
+            self._buckets.move_to_end(bucket)
+            if not entries.append(embedding, payload):
+                self._size += 1
+
+            # Evict the oldest entries of the least recently used buckets
+            while self._size > self.max_entries:
+                lru_bucket, lru_entries = next(iter(self._buckets.items()))
+                lru_entries.popleft()
+                self._size -= 1
+                if not lru_entries.count:
+                    del self._buckets[lru_bucket]
+
+    def purge(self) -> int:
+        with self._lock:
+            purged = self._size
+            self._buckets.clear()
+            self._size = 0
+            return purged
+
+    def stats(self) -> dict:
+        return {
+            "size": self._size,
+            "buckets": len(self._buckets),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+        }
+
+
+def replay_answer(answer: str) -> Generator[str, None, None]:
+    """Replay a cached answer as a stream of word chunks."""
+    words = answer.split(" ")
+    for idx, word in enumerate(words):
+        yield word if idx == len(words) - 1 else f"{word} "
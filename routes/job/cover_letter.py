@@ -5,6 +5,7 @@ from fastapi.param_functions import Depends
 from fastapi.responses import StreamingResponse
 from typing import List, Dict, Optional
 from jet.file.utils import save_file, load_file
+from helpers.corpus_cache import get_corpus, load_cached_file
 from jet.llm.models import OLLAMA_MODEL_NAMES
 from jet.logger import logger
 from jet._token.token_utils import get_ollama_tokenizer
@@ -198,8 +199,9 @@ def generate_cover_letter(request: CoverLetterRequest):
     if request.text:
         cover_letter_context = request.text
     elif request.job_id:
-        jobs: list[JobData] = load_file(JOBS_FILE) or []
-        job = next((job for job in jobs if job['id'] == request.job_id), None)
+        jobs_by_id: dict[str, JobData] = get_corpus(
+            JOBS_FILE).id_map if os.path.isfile(JOBS_FILE) else {}
+        job = jobs_by_id.get(request.job_id)
         if job:
             attributes = request.attributes or ["title", "details"]
             json_parts_dict = extract_values_by_paths(
@@ -244,7 +246,7 @@ def generate_cover_letters(request: JobGenerateCoverLettersRequest):
     llm = Ollama(model=request.model)
 
     jobs_file = request.jobs_file or JOBS_FILE
-    jobs: list[JobData] = load_file(jobs_file) or []
+    jobs: list[JobData] = load_cached_file(jobs_file, default=[]) or []
 
     if request.job_ids:
         jobs = [job for job in jobs if job['id'] in request.job_ids]
@@ -1,9 +1,14 @@
+import asyncio
 import json
+import queue
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Awaitable, Generator, Literal, Optional
 from jet.data.utils import generate_key
 from jet.llm.ollama.constants import OLLAMA_LARGE_EMBED_MODEL
 from jet.llm.utils.embeddings import get_ollama_embedding_function
+from jet.file.utils import load_file
 from jet.llm.utils.llama_index_utils import display_jet_source_nodes
 from jet.memory.lru_cache import LRUCache
 from llama_index.core.retrievers.fusion_retriever import FUSION_MODES
@@ -13,12 +18,16 @@ from tqdm import tqdm
 from jet.actions.prompts_generator import PromptsGenerator
 from jet.llm.ollama.base import Ollama
 from jet.transformers.formatters import format_json
+from jet.transformers.object import make_serializable
 from pydantic import BaseModel
 from fastapi import APIRouter, Query, Request
 from fastapi.responses import StreamingResponse
 from jet.vectors.utils import get_source_node_attributes
 from jet.logger import logger
 
+from helpers.context_packing import DEFAULT_RESERVED_OUTPUT_TOKENS
+from helpers.fusion import reciprocal_rank_fusion
+from helpers.ingest import ingest_status
 from helpers.rag import RAG
 from config import stop_event
 
@@ -26,6 +35,19 @@ router = APIRouter()
 
 # Create default RAG instance (will be updated in the endpoint)
 rag_global_dict = LRUCache(max_size=5)
+# Warm-started RAGs by cache key; never evicted by the LRU
+pinned_rags: dict[str, RAG] = {}
+# Warm-start status per manifest entry, reported by /health/ready
+rag_readiness: dict[str, dict] = {}
+last_hash: Optional[str] = None
+rag_build_lock = threading.Lock()
+
+# RAG constructor arguments that change the built index
+RAG_INDEX_DEPS = [
+    "path_or_docs", "extensions", "json_attributes", "exclude_json_attributes", "metadata_attributes",
+    "chunk_size", "chunk_overlap", "sub_chunk_sizes", "with_hierarchy", "disable_chunking", "split_mode",
+    "mode", "model", "embed_model", "store_path", "embedding_dtype", "parallel_ingest", "ingest_workers",
+]
 
 rag_dir: str = "/Users/jethroestrada/Desktop/External_Projects/Jet_Projects/JetScripts/data/jet-resume/data"
 json_attributes: list[str] = ["title", "details"]
@@ -48,11 +70,19 @@ top_k: Optional[int] = None
 model: str = "llama3.2"
 embed_model: str = OLLAMA_LARGE_EMBED_MODEL
 mode: Literal["annoy", "fusion", "bm25", "hierarchy",
-              "deeplake", "faiss", "graph_nx"] = "fusion"
+              "deeplake", "faiss", "graph_nx", "hybrid"] = "fusion"
 store_path: str = "/Users/jethroestrada/Desktop/External_Projects/Jet_Projects/jet_server/.cache/deeplake/store_1"
 score_threshold: float = 0.0
 split_mode: list[Literal["markdown", "hierarchy"]] = []
 fusion_mode: FUSION_MODES = FUSION_MODES.SIMPLE
+hybrid_alpha: float = 0.5
+embedding_dtype: Literal["float32", "float16", "int8"] = "float32"
+rescore_top_k: int = 0
+rerank: bool = False
+rerank_candidates: Optional[int] = None
+rerank_latency_budget: Optional[float] = None
+parallel_ingest: bool = False
+ingest_workers: Optional[int] = None
 contexts: list[str] = []
 disable_chunking: Optional[bool] = False
 
@@ -74,11 +104,20 @@ class QueryRequest(BaseModel):
     model: str = model
     embed_model: str = embed_model
     mode: Literal["annoy", "fusion", "bm25", "hierarchy",
-                  "deeplake", "faiss", "graph_nx"] = mode
+                  "deeplake", "faiss", "graph_nx", "hybrid"] = mode
     store_path: str = store_path
     score_threshold: float = score_threshold
     split_mode: list[Literal["markdown", "hierarchy"]] = split_mode
     fusion_mode: FUSION_MODES = fusion_mode
+    hybrid_alpha: float = hybrid_alpha
+    embedding_dtype: Literal["float32",
+                             "float16", "int8"] = embedding_dtype
+    rescore_top_k: int = rescore_top_k
+    rerank: bool = rerank
+    rerank_candidates: Optional[int] = rerank_candidates
+    rerank_latency_budget: Optional[float] = rerank_latency_budget
+    parallel_ingest: bool = parallel_ingest
+    ingest_workers: Optional[int] = ingest_workers
     disable_chunking: Optional[bool] = False
 
 
@@ -86,6 +125,26 @@ class SearchRequest(QueryRequest):
     contexts: list[str] = contexts
 
 
+class StreamNodesRequest(QueryRequest):
+    max_workers: int = 4
+    fuse_results: bool = False
+    rrf_k: int = 60
+
+
+class BatchQueryRequest(QueryRequest):
+    query: Optional[str] = None
+    queries: list[str]
+    batch_size: int = 256
+    # Defaults to streaming NDJSON when there is more than one batch
+    stream: Optional[bool] = None
+
+
+class WarmCacheRequest(QueryRequest):
+    query: Optional[str] = None
+    queries: list[str | dict] = []
+    query_log: Optional[str] = None
+
+
 class VectorNode(BaseModel):
     id: str
     score: float
@@ -112,60 +171,148 @@ class VectorNodesResponse(BaseModel):
         return cls(count=len(transformed_nodes), data=transformed_nodes)
 
 
-def setup_rag(**kwargs) -> RAG:
+def get_rag_cache_key(**kwargs) -> str:
+    """Cache key of the RAG built from these arguments."""
+    return generate_key(*[kwargs.get(key) for key in RAG_INDEX_DEPS])
+
+
+def iter_cached_rags() -> Generator[tuple[str, str, RAG], None, None]:
+    """Yield (cache key, mode, rag) for pinned and LRU cached RAGs."""
+    for key, rag in list(pinned_rags.items()):
+        yield key, rag.mode, rag
+    for key, value in rag_global_dict.items():
+        if isinstance(value, dict) and key not in pinned_rags:
+            yield key, value["mode"], value["rag"]
+
+
+def is_rag_loaded(cache_key: str) -> bool:
+    return cache_key in pinned_rags or rag_global_dict.get(cache_key) is not None
+
+
+def setup_rag(pin: bool = False, **kwargs) -> RAG:
     """
     Setup a RAG object and store it in a global dictionary with a unique mode.
 
     Args:
-        rag_dir (str): Path to the RAG directory.
+        pin (bool): Keep the RAG loaded instead of letting the LRU evict it.
         **kwargs: Additional arguments for RAG initialization.
 
     Returns:
         RAG: The initialized RAG object.
     """
-    global rag_global_dict
+    global rag_global_dict, last_hash
 
     mode = kwargs.get("mode")
     if mode is None:
         raise ValueError("The 'mode' key must be provided in kwargs.")
 
-    # Dependencies for hash computation
-    deps = ["path_or_docs", "json_attributes", "exclude_json_attributes", "metadata_attributes",
-            "chunk_size", "chunk_overlap", "disable_chunking"]
-    deps_values = [kwargs[key] for key in deps if key in kwargs]
-    current_hash = generate_key(*deps_values)
+    current_hash = get_rag_cache_key(**kwargs)
 
-    # Check if cache needs to be cleared due to changed hash
-    last_hash = rag_global_dict.get("last_hash")
+    # Different dependencies get their own cached RAG; the LRU evicts the oldest
     if last_hash and last_hash != current_hash:
-        logger.warning("Detected change in dependencies. Clearing RAG cache.")
-        rag_global_dict.clear()
+        logger.info("Detected change in dependencies. Using separate RAG cache entry.")
+    last_hash = current_hash
+
+    # Check if RAG with the same dependencies already exists
+    if current_hash in pinned_rags:
+        logger.info("Reusing pinned RAG object with mode: %s", mode)
+        return pinned_rags[current_hash]
+
+    # RAG construction sets the global llama_index Settings and builds the
+    # index with them, so builds (warm starts included) run one at a time
+    with rag_build_lock:
+        if current_hash in pinned_rags:
+            return pinned_rags[current_hash]
+
+        existing_entry = rag_global_dict.get(current_hash)
+        if existing_entry:
+            logger.info("Reusing existing RAG object with mode: %s", mode)
+            if pin:
+                pinned_rags[current_hash] = existing_entry["rag"]
+            return existing_entry["rag"]
+
+        # Initialize the RAG object
+        rag = RAG(**kwargs)
+
+        if pin:
+            pinned_rags[current_hash] = rag
+        else:
+            # Cache the new RAG object
+            rag_global_dict.put(current_hash, {
+                "rag": rag,
+                "mode": mode,
+                "hash": current_hash
+            })
 
-    # Check if RAG with the same mode and hash already exists
-    existing_entry = rag_global_dict.get(current_hash)
-    if existing_entry:
-        logger.info("Reusing existing RAG object with mode: %s", mode)
-        return existing_entry["rag"]
+    logger.debug("Created RAG object for cache key: %s", current_hash)
+    logger.info("Cached RAG in memory: %d (%d pinned)",
+                len(rag_global_dict), len(pinned_rags))
+    logger.debug(format_json({key: value['mode'] for key, value in rag_global_dict.items()}))
 
-    # Initialize the RAG object
-    rag = RAG(**kwargs)
+    return rag
 
-    # Store the latest hash for comparison
-    rag_global_dict.put("last_hash", current_hash)
 
-    # Cache the new RAG object
-    rag_global_dict.put(current_hash, {
-        "rag": rag,
-        "mode": mode,
-        "hash": current_hash
-    })
+def load_warmup_manifest(manifest_path: str) -> list[dict]:
+    """
+    Load RAG warm-start entries from a JSON or YAML manifest.
 
-    logger.debug("Created RAG object for cache key: %s", current_hash)
-    logger.info("Cached RAG in memory: %d", len(rag_global_dict))
-    logger.debug(format_json({key: value if not isinstance(
-        value, dict) else value['mode'] for key, value in rag_global_dict.items()}))
+    The manifest is a list (or a dict with an "indexes" list) of QueryRequest
+    fields such as rag_dir, mode, embed_model and chunking options, plus an
+    optional "name" used for readiness reporting.
+    """
+    if manifest_path.endswith((".yaml", ".yml")):
+        import yaml
 
-    return rag
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = yaml.safe_load(f)
+    else:
+        manifest = load_file(manifest_path)
+
+    if isinstance(manifest, dict):
+        manifest = manifest.get("indexes", [])
+    return manifest or []
+
+
+async def warm_start_rags(manifest_path: str, concurrency: int = 1):
+    """
+    Pre-build the RAG indexes listed in a manifest in background threads.
+
+    Index builds are serialized by setup_rag, so a `concurrency` above 1 only
+    queues more builds behind the one in progress.
+    """
+    entries = load_warmup_manifest(manifest_path)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def warm_start_rag(name: str, entry: dict):
+        async with semaphore:
+            rag_readiness[name]["status"] = "building"
+            start_time = time.time()
+            try:
+                query_request_dict = QueryRequest(query="", **entry).__dict__.copy()
+                query_request_dict.pop("query")
+                query_request_dict["path_or_docs"] = query_request_dict.pop("rag_dir")
+                rag_readiness[name]["key"] = get_rag_cache_key(**query_request_dict)
+                # Pinned so requests for other indexes cannot evict it
+                await asyncio.to_thread(
+                    setup_rag,
+                    pin=True,
+                    **query_request_dict
+                )
+                rag_readiness[name]["status"] = "ready"
+            except Exception as e:
+                logger.error(f"Failed to warm start RAG {name}: {e}")
+                rag_readiness[name].update(status="failed", error=str(e))
+            rag_readiness[name]["elapsed"] = time.time() - start_time
+
+    tasks = []
+    for entry in entries:
+        entry = dict(entry)
+        name = entry.pop("name", None) or f"{entry.get('rag_dir', rag_dir)}:{entry.get('mode', mode)}"
+        rag_readiness[name] = {"status": "pending"}
+        tasks.append(asyncio.create_task(warm_start_rag(name, entry)))
+
+    logger.info(f"Warm starting {len(tasks)} RAG indexes from {manifest_path}")
+    await asyncio.gather(*tasks)
 
 
 def generate_sub_prompts(prompts: list[str]) -> Generator[str, None, None]:
@@ -208,12 +355,18 @@ async def query(
     model: str = Query(default=model),
     embed_model: str = Query(default=embed_model),
     mode: Literal["annoy", "fusion", "bm25", "hierarchy",
-                  "deeplake", "faiss", "graph_nx"] = Query(default=mode),
+                  "deeplake", "faiss", "graph_nx", "hybrid"] = Query(default=mode),
     store_path: str = Query(default=store_path),
     score_threshold: float = Query(default=score_threshold),
     split_mode: list[Literal["markdown", "hierarchy"]
                      ] = Query(default=split_mode),
     contexts: list[str] = Query(default=contexts),
+    events: bool = Query(default=False),
+    initial_top_k: int = Query(default=3),
+    refine: bool = Query(default=False),
+    context_window: Optional[int] = Query(default=None),
+    reserved_output_tokens: int = Query(default=DEFAULT_RESERVED_OUTPUT_TOKENS),
+    semantic_cache_threshold: Optional[float] = Query(default=None),
 ):
     global stop_event
 
@@ -247,10 +400,17 @@ async def query(
         fusion_mode=fusion_mode,
         contexts=contexts,
     )
-    return StreamingResponse(event_stream_query(search_request), headers=headers)
+    query_options = {
+        "context_window": context_window,
+        "reserved_output_tokens": reserved_output_tokens,
+        "semantic_cache_threshold": semantic_cache_threshold,
+    }
+    if events:
+        return StreamingResponse(event_stream_query_events(search_request, initial_top_k=initial_top_k, refine=refine, **query_options), headers=headers)
+    return StreamingResponse(event_stream_query(search_request, **query_options), headers=headers)
 
 
-def event_stream_query(search_request: SearchRequest):
+def event_stream_query(search_request: SearchRequest, **kwargs):
     search_request_dict = search_request.__dict__.copy()
     query = search_request_dict.pop("query")
     system = search_request_dict.pop("system")
@@ -263,11 +423,59 @@ def event_stream_query(search_request: SearchRequest):
         **search_request_dict
     )
 
-    for chunk in rag.query(query, contexts, top_k=top_k, system=system, stop_event=stop_event):
+    for chunk in rag.query(query, contexts, top_k=top_k, system=system, stop_event=stop_event, **kwargs):
         message = f"data: {chunk}\n\n"
         yield message
 
 
+def format_sse(event_type: str, data: Any) -> str:
+    """Format an SSE message with an event type and a JSON payload."""
+    return f"event: {event_type}\ndata: {format_json(make_serializable(data), indent=None)}\n\n"
+
+
+def event_stream_query_events(search_request: SearchRequest, initial_top_k: int = 3, refine: bool = False, **kwargs):
+    """Stream "sources", "token", "refine" and "done" events for a RAG query."""
+    search_request_dict = search_request.__dict__.copy()
+    query = search_request_dict.pop("query")
+    system = search_request_dict.pop("system")
+    contexts = search_request_dict.pop("contexts")
+    top_k = search_request.top_k
+
+    rag = setup_rag(
+        system=system,
+        path_or_docs=search_request_dict.pop("rag_dir"),
+        **search_request_dict
+    )
+
+    for event_type, data in rag.stream_query(query, contexts, top_k=top_k, system=system, stop_event=stop_event, initial_top_k=initial_top_k, refine=refine, **kwargs):
+        yield format_sse(event_type, data)
+
+
+@router.get("/query/cache")
+async def get_query_cache_stats():
+    """Report semantic answer cache hit rates for each cached RAG."""
+    return {
+        "data": [
+            {
+                "hash": key,
+                "mode": mode,
+                **rag.answer_cache.stats(),
+            }
+            for key, mode, rag in iter_cached_rags()
+        ]
+    }
+
+
+@router.delete("/query/cache")
+async def purge_query_cache():
+    """Purge cached answers from every cached RAG."""
+    purged = sum(
+        rag.answer_cache.purge()
+        for _, _, rag in iter_cached_rags()
+    )
+    return {"purged": purged}
+
+
 @router.post("/query/stop")
 async def query_stop():
     global stop_event
@@ -307,8 +515,96 @@ async def get_nodes(query_request: QueryRequest):
     }
 
 
+@router.post("/nodes/batch")
+async def get_nodes_batch(batch_request: BatchQueryRequest):
+    """
+    Retrieve nodes for many queries in one request.
+
+    Queries are processed in chunks of `batch_size`, each embedded and scored
+    together. Large requests stream one NDJSON line per query as chunks finish.
+    """
+    batch_request_dict = batch_request.__dict__.copy()
+    batch_request_dict.pop("query")
+    queries = batch_request_dict.pop("queries")
+    batch_size = max(batch_request_dict.pop("batch_size"), 1)
+    stream = batch_request_dict.pop("stream")
+    if stream is None:
+        stream = len(queries) > batch_size
+
+    rag = setup_rag(
+        path_or_docs=batch_request_dict.pop("rag_dir"),
+        **batch_request_dict
+    )
+
+    def iter_batch_results() -> Generator[tuple[str, list], None, None]:
+        for start in range(0, len(queries), batch_size):
+            batch_queries = queries[start:start + batch_size]
+            results = rag.get_results_batch(
+                batch_queries, **batch_request_dict)
+            for query, result in zip(batch_queries, results):
+                yield query, result["nodes"]
+
+    if not stream:
+        data = [{"query": query, "data": nodes}
+                for query, nodes in iter_batch_results()]
+        return {"count": len(data), "data": data}
+
+    def generate_stream():
+        for query, nodes in iter_batch_results():
+            yield json.dumps(make_serializable({"query": query, "data": nodes})) + "\n"
+
+    return StreamingResponse(generate_stream(), media_type="application/x-ndjson")
+
+
+@router.get("/ingest/status")
+async def get_ingest_status():
+    """Report parallel ingestion progress per RAG directory."""
+    return {"data": ingest_status}
+
+
+@router.get("/nodes/cache")
+async def get_nodes_cache_stats():
+    """Report retrieval cache hit/miss counters for each cached RAG."""
+    return {
+        "data": [
+            {
+                "hash": key,
+                "mode": mode,
+                "index_version": rag.index_version,
+                **rag.results_cache.stats(),
+            }
+            for key, mode, rag in iter_cached_rags()
+        ]
+    }
+
+
+@router.post("/nodes/cache/warm")
+async def warm_nodes_cache(warm_request: WarmCacheRequest):
+    """Pre-compute retrieval results for queries from a request body or a query log file."""
+    warm_request_dict = warm_request.__dict__.copy()
+    warm_request_dict.pop("query")
+    queries = warm_request_dict.pop("queries")
+    query_log = warm_request_dict.pop("query_log")
+
+    if query_log:
+        queries = [*queries, *(load_file(query_log) or [])]
+
+    rag = setup_rag(
+        path_or_docs=warm_request_dict.pop("rag_dir"),
+        **warm_request_dict
+    )
+
+    count = rag.warm_cache(queries, **warm_request_dict)
+
+    return {
+        "count": count,
+        "index_version": rag.index_version,
+        **rag.results_cache.stats(),
+    }
+
+
 @router.post("/stream-nodes", response_model=VectorNodesResponse)
-async def stream_nodes(query_request: QueryRequest):
+async def stream_nodes(query_request: StreamNodesRequest):
     headers = {
         "Cache-Control": "no-cache",
         # "Connection": "keep-alive",
@@ -317,10 +613,24 @@ async def stream_nodes(query_request: QueryRequest):
     return StreamingResponse(event_stream_nodes(query_request), headers=headers)
 
 
-def event_stream_nodes(query_request: QueryRequest) -> Generator[str, None, None]:
-    """Generator function to yield events for streaming."""
+def get_node_id(node: dict | NodeWithScore) -> str:
+    return node["id"] if isinstance(node, dict) else node.node_id
+
+
+def event_stream_nodes(query_request: StreamNodesRequest) -> Generator[str, None, None]:
+    """
+    Generator function to yield events for streaming.
+
+    Sub-prompts are dispatched to a bounded worker pool as soon as the
+    generator produces them, and results are streamed in completion order.
+    With `fuse_results`, a final "fused" event carries the reciprocal rank
+    fusion of all sub-prompt rankings.
+    """
     query_request_dict = query_request.__dict__.copy()
     query = query_request_dict.pop("query")
+    max_workers = query_request_dict.pop("max_workers")
+    fuse_results = query_request_dict.pop("fuse_results")
+    rrf_k = query_request_dict.pop("rrf_k")
     top_k = query_request.top_k
 
     rag = setup_rag(
@@ -328,17 +638,60 @@ def event_stream_nodes(query_request: QueryRequest) -> Generator[str, None, None
         **query_request_dict
     )
 
-    stream_prompts = generate_sub_prompts([query])
-
-    for prompt in stream_prompts:
-        result = rag.get_results(
-            prompt, top_k=top_k)
-
-        transformed_nodes = VectorNodesResponse.from_nodes(result["nodes"])
-        yield f"data: {transformed_nodes}\n\n"
-
-        logger.debug("Result Prompt:", prompt)
-        logger.success(format_json(transformed_nodes))
+    # Events are ("result", prompt, future), ("error", exception) or ("done", count)
+    completed: queue.Queue[tuple] = queue.Queue()
+
+    def dispatch_prompts(executor: ThreadPoolExecutor):
+        submitted = 0
+        try:
+            for prompt in generate_sub_prompts([query]):
+                future = executor.submit(rag.get_results, prompt, top_k=top_k)
+                future.add_done_callback(
+                    lambda f, prompt=prompt: completed.put(("result", prompt, f)))
+                submitted += 1
+        except Exception as e:
+            completed.put(("error", e))
+        finally:
+            completed.put(("done", submitted))
+
+    rankings = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        dispatcher = threading.Thread(
+            target=dispatch_prompts, args=(executor,), daemon=True)
+        dispatcher.start()
+
+        received = 0
+        submitted: Optional[int] = None
+        while submitted is None or received < submitted:
+            event = completed.get()
+            if event[0] == "done":
+                submitted = event[1]
+                continue
+            if event[0] == "error":
+                raise event[1]
+
+            _, prompt, future = event
+            received += 1
+            result = future.result()
+            rankings.append(result["nodes"])
+
+            transformed_nodes = VectorNodesResponse.from_nodes(result["nodes"])
+            yield f"data: {transformed_nodes}\n\n"
+
+            logger.debug("Result Prompt:", prompt)
+            logger.success(format_json(transformed_nodes))
+
+        dispatcher.join()
+
+    if fuse_results:
+        fused = reciprocal_rank_fusion(
+            rankings, k=rrf_k, key=get_node_id, top_k=top_k)
+        fused_nodes = VectorNodesResponse.from_nodes([
+            {**node, "score": score} if isinstance(node, dict)
+            else NodeWithScore(node=node.node, score=score)
+            for node, score in fused
+        ])
+        yield f"event: fused\ndata: {fused_nodes}\n\n"
 
 
 @router.post("/sample-stream")
@@ -388,7 +741,6 @@ def event_sample_stream(request_params: Optional[Any] = None):
 
 
 if __name__ == "__main__":
-    import asyncio
     from pprint import pprint
 
     async def main():
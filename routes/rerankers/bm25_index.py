@@ -0,0 +1,223 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from typing import Any, Callable, Optional
+
+import numpy as np
+from jet.logger import logger
+from jet.memory.lru_cache import LRUCache
+
+from helpers.corpus_cache import file_signature, get_corpus
+from helpers.hybrid_search import BM25Index
+from .phrase_index import PhraseIndex
+
+
+BM25_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".cache", "bm25")
+# Bump when tokenization or the persisted layout changes, so that indexes
+# written by older code are rebuilt instead of loaded
+INDEX_VERSION = 2
+
+
+def content_id(text: str) -> str:
+    """Stable document id derived from its text."""
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+class CorpusBM25Index:
+    """
+    BM25 index over the formatted records of one data file.
+
+    Built once per file version (path, mtime and size) and record formatter
+    and persisted under `BM25_CACHE_DIR` alongside the formatted texts and
+    their content hash ids, so a restart only reads the arrays back instead
+    of reparsing and retokenizing the file. A positional `PhraseIndex` over the same texts
+    answers which sentences match each query.
+    """
+
+    def __init__(self, ids: list[str], texts: list[str], index: BM25Index, phrase_index: PhraseIndex):
+        self.ids = ids
+        self.texts = texts
+        self.index = index
+        self.phrase_index = phrase_index
+
+    @classmethod
+    def build(cls, texts: list[str]) -> "CorpusBM25Index":
+        index = BM25Index.build(texts)
+        return cls([content_id(text) for text in texts], texts, index, PhraseIndex.build(texts, index.vocab))
+
+    def save(self, directory: str) -> None:
+        self.index.save(directory)
+        self.phrase_index.save(directory)
+        with open(os.path.join(directory, "corpus.json"), "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "texts": self.texts}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "CorpusBM25Index":
+        with open(os.path.join(directory, "corpus.json"), encoding="utf-8") as f:
+            corpus = json.load(f)
+        index = BM25Index.load(directory)
+        if os.path.isfile(os.path.join(directory, "phrases.npz")):
+            phrase_index = PhraseIndex.load(directory, index.vocab)
+        else:
+            # Indexes persisted before phrase matching existed
+            phrase_index = PhraseIndex.build(corpus["texts"], index.vocab)
+            phrase_index.save(directory)
+        return cls(corpus["ids"], corpus["texts"], index, phrase_index)
+
+    def score(self, queries: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Score every document against all queries at once.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The (num_queries, num_docs) BM25
+                scores and each document's similarity, their sum over queries.
+        """
+        query_scores = self.index.score_batch(queries)
+        return query_scores, query_scores.sum(axis=0)
+
+    def formatter(
+        self,
+        queries: list[str],
+        query_scores: np.ndarray,
+        similarities: np.ndarray,
+    ) -> Callable[[int, int, float], dict[str, Any]]:
+        """Build a `(group, idx, similarity) -> result` formatter for a scoring pass."""
+        max_similarity = max(float(similarities.max(initial=0.0)), 1e-12)
+        normalized_scores = query_scores / \
+            np.maximum(query_scores.max(axis=1, keepdims=True), 1e-12)
+        # Phrase occurrences are looked up once per query for all documents
+        positions = [self.phrase_index.find(query) for query in queries]
+        return lambda group, idx, similarity: self._format_result(
+            idx, queries, positions, normalized_scores[:, idx], similarity, max_similarity)
+
+    def search(self, queries: list[str], top_k: Optional[int] = None) -> list[dict[str, Any]]:
+        """
+        Rank documents by their summed BM25 score over the queries.
+
+        `score` is the similarity normalized by the best one. Documents
+        matching none of the queries are left out.
+        """
+        query_scores, similarities = self.score(queries)
+
+        matching = np.flatnonzero(similarities > 0)
+        if top_k is not None and top_k < len(matching):
+            matching = matching[np.argpartition(
+                -similarities[matching], top_k - 1)[:top_k]]
+        matching = matching[np.argsort(-similarities[matching], kind="stable")]
+
+        format_result = self.formatter(queries, query_scores, similarities)
+        return [format_result(0, int(idx), float(similarities[idx])) for idx in matching]
+
+    def _format_result(
+        self,
+        idx: int,
+        queries: list[str],
+        positions: list[np.ndarray],
+        query_scores: np.ndarray,
+        similarity: float,
+        max_similarity: float,
+    ) -> dict[str, Any]:
+        text = self.texts[idx]
+
+        matched: dict[str, int] = {}
+        matched_sentences: dict[str, list[dict]] = {}
+        for query, query_positions, query_score in zip(queries, positions, query_scores):
+            count, matches = self.phrase_index.doc_matches(
+                idx, text, query, query_positions, float(query_score))
+            if count:
+                matched[query] = count
+                matched_sentences[query] = matches
+
+        return {
+            "id": self.ids[idx],
+            "text": text,
+            "score": similarity / max_similarity,
+            "similarity": similarity,
+            "matched": matched,
+            "matched_sentences": matched_sentences,
+        }
+
+
+_indexes = LRUCache(max_size=4)
+_indexes_lock = threading.Lock()
+# One lock per (data file, formatter) cache directory being built
+_build_locks: dict[tuple[str, str], threading.Lock] = {}
+
+
+def formatter_id(format_text: Callable[[Any], str]) -> str:
+    """Identify a formatter by its qualified name and bytecode."""
+    name = f"{getattr(format_text, '__module__', '')}.{getattr(format_text, '__qualname__', repr(format_text))}"
+    code = getattr(format_text, "__code__", None)
+    if code is None:
+        return name
+    return f"{name}:{hashlib.sha256(code.co_code).hexdigest()[:12]}"
+
+
+def prune_index_dirs(source_dir: str, keep: str) -> None:
+    """
+    Remove the indexes of older versions of a (data file, formatter) pair,
+    and indexes left directly under `BM25_CACHE_DIR` by the flat layout
+    used before INDEX_VERSION 2.
+    """
+    for name in os.listdir(source_dir):
+        path = os.path.join(source_dir, name)
+        if name != keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+    for name in os.listdir(BM25_CACHE_DIR):
+        path = os.path.join(BM25_CACHE_DIR, name)
+        if os.path.isfile(os.path.join(path, "corpus.json")):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def get_bm25_index(data_file: str, format_text: Callable[[Any], str]) -> CorpusBM25Index:
+    """
+    Return the BM25 index of a data file, loading it from disk or building it
+    when the file changed since the index was persisted. Indexes are kept per
+    formatter, since the formatted texts are what gets indexed.
+
+    Each (data file, formatter) pair has one directory under `BM25_CACHE_DIR`
+    holding a subdirectory per file version; building a new version removes
+    the older ones.
+    """
+    path, mtime_ns, size = file_signature(data_file)
+    text_format = formatter_id(format_text)
+    key = (path, mtime_ns, size, text_format, INDEX_VERSION)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            return index
+        build_lock = _build_locks.setdefault((path, text_format), threading.Lock())
+
+    with build_lock:
+        with _indexes_lock:
+            index = _indexes.get(key)
+        if index is not None:
+            return index
+
+        try:
+            source_dir = os.path.join(BM25_CACHE_DIR, hashlib.sha256(
+                json.dumps([path, text_format]).encode()).hexdigest())
+            version = hashlib.sha256(json.dumps(
+                [mtime_ns, size, INDEX_VERSION]).encode()).hexdigest()[:16]
+            directory = os.path.join(source_dir, version)
+            if os.path.isfile(os.path.join(directory, "corpus.json")):
+                index = CorpusBM25Index.load(directory)
+            else:
+                texts = get_corpus(data_file).view(
+                    f"texts:{text_format}", lambda data: [format_text(obj) for obj in data])
+                index = CorpusBM25Index.build(texts)
+                index.save(directory)
+                prune_index_dirs(source_dir, keep=version)
+                logger.info(
+                    f"Built BM25 index for {data_file} with {len(index.texts)} documents")
+
+            with _indexes_lock:
+                _indexes.put(key, index)
+        finally:
+            with _indexes_lock:
+                _build_locks.pop((path, text_format), None)
+        return index
@@ -0,0 +1,125 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Callable, Generator, Sequence
+
+import numpy as np
+from jet.logger import logger
+from jet.memory.lru_cache import LRUCache
+
+from helpers.corpus_cache import file_signature
+from helpers.hybrid_search import normalize_rows
+
+
+EMBEDDINGS_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".cache", "embeddings")
+
+
+class SentenceEmbeddingIndex:
+    """
+    L2-normalized sentence embeddings of one data file.
+
+    The matrix is persisted as a `.npy` file and opened as a read-only
+    memmap, so it is encoded once per file version and shared between
+    requests (and processes) without being copied into each one.
+    """
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def iter_scores(
+        self,
+        query_embeddings: np.ndarray,
+        chunk_size: int = 4096,
+    ) -> Generator[tuple[int, np.ndarray, np.ndarray], None, None]:
+        """Yield (query index, rows, scores) for `chunk_size` sentences at a time."""
+        queries = normalize_rows(np.atleast_2d(
+            np.asarray(query_embeddings, dtype=np.float32)))
+        for start in range(0, len(self.embeddings), chunk_size):
+            rows = np.arange(start, min(start + chunk_size, len(self.embeddings)))
+            similarities = queries @ np.asarray(self.embeddings[start:rows[-1] + 1]).T
+            for query_idx, scores in enumerate(similarities):
+                yield query_idx, rows, scores
+
+
+_indexes = LRUCache(max_size=4)
+_indexes_lock = threading.Lock()
+# One lock per (file, model) cache directory being built, so encoding one
+# index never blocks lookups of the others
+_build_locks: dict[tuple[str, str], threading.Lock] = {}
+
+
+def get_sentence_embeddings(
+    data_file: str,
+    model_name: str,
+    sentences: Sequence[str],
+    encode: Callable[[Sequence[str]], np.ndarray],
+) -> SentenceEmbeddingIndex:
+    """
+    Return the sentence embeddings of a data file for a model.
+
+    Embeddings are looked up in memory, then on disk, and only encoded
+    when the file's mtime or size changed since they were persisted.
+    Concurrent requests for the same index wait for a single encode.
+    """
+    signature = file_signature(data_file)
+    key = (signature, model_name)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            return index
+        build_lock = _build_locks.setdefault(
+            (signature[0], model_name), threading.Lock())
+
+    with build_lock:
+        with _indexes_lock:
+            index = _indexes.get(key)
+        if index is not None:
+            return index
+
+        try:
+            index = _load_or_encode(data_file, model_name, signature, sentences, encode)
+            with _indexes_lock:
+                _indexes.put(key, index)
+        finally:
+            with _indexes_lock:
+                _build_locks.pop((signature[0], model_name), None)
+        return index
+
+
+def _load_or_encode(
+    data_file: str,
+    model_name: str,
+    signature: tuple[str, int, int],
+    sentences: Sequence[str],
+    encode: Callable[[Sequence[str]], np.ndarray],
+) -> SentenceEmbeddingIndex:
+    directory = os.path.join(EMBEDDINGS_CACHE_DIR, hashlib.sha256(
+        json.dumps([signature[0], model_name]).encode()).hexdigest())
+    meta_path = os.path.join(directory, "meta.json")
+    embeddings_path = os.path.join(directory, "embeddings.npy")
+
+    meta = {"mtime_ns": signature[1], "size": signature[2],
+            "num_sentences": len(sentences)}
+    cached_meta = None
+    if os.path.isfile(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            cached_meta = json.load(f)
+
+    if cached_meta != meta:
+        embeddings = normalize_rows(
+            np.asarray(encode(sentences), dtype=np.float32))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, "embeddings.tmp.npy")
+        np.save(tmp_path, embeddings)
+        os.replace(tmp_path, embeddings_path)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        logger.info(
+            f"Encoded {len(sentences)} sentences of {data_file} with {model_name}")
+
+    return SentenceEmbeddingIndex(np.load(embeddings_path, mmap_mode="r"))
@@ -1,18 +1,20 @@
-from fastapi import APIRouter, HTTPException
-from jet.data.utils import generate_unique_hash
-from jet.file.utils import load_file
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request
 from jet.search.formatters import clean_string
 from typing import List, Dict, Any, Optional, TypedDict
 from jet.utils.object import extract_values_by_paths
-from jet.vectors.reranker.bm25 import get_bm25_similarities_old
 from jet.wordnet.n_grams import get_most_common_ngrams
 from shared.data_types.job import JobData
 from jet.cache.cache_manager import CacheManager
+from .bm25_index import get_bm25_index
 from .reranker_types import SimilarityRequest, SimilarityResult
+from .streaming import stream_ranking
 
 router = APIRouter()
 cache_manager = CacheManager()
 
+STREAM_BATCH_SIZE = 256
+
 
 class SimilarityRequestData(TypedDict):
     queries: List[str]
@@ -53,16 +55,31 @@ def format_texts(object: dict[str, Any], json_attributes: list[str] = [], exclud
     return text_content
 
 
+def format_record(obj: str | dict[str, Any]) -> str:
+    return format_texts(obj) if isinstance(obj, dict) else obj
+
+
 @router.post("/bm25")
-async def bm25_reranker(request: SimilarityRequest) -> SimilarityResult:
+async def bm25_reranker(request: SimilarityRequest, http_request: Request) -> SimilarityResult:
     """API endpoint to perform BM25+ similarity ranking."""
-    data: list[str | dict[str, Any]] = load_file(request.data_file)
-    texts = [format_texts(obj) if isinstance(
-        obj, dict) else obj for obj in data]
-    ids = [generate_unique_hash() for _ in texts]
+    bm25_index = get_bm25_index(request.data_file, format_record)
+
+    if request.stream:
+        # Scoring is a single vectorized pass; matching documents are then
+        # ranked and formatted in batches
+        query_scores, similarities = bm25_index.score(request.queries)
+        matching = np.flatnonzero(similarities > 0)
+
+        def batches():
+            for start in range(0, len(matching), STREAM_BATCH_SIZE):
+                rows = matching[start:start + STREAM_BATCH_SIZE]
+                yield 0, rows, similarities[rows]
+
+        format_result = bm25_index.formatter(
+            request.queries, query_scores, similarities)
+        return stream_ranking(http_request, batches(), 1, format_result, total=len(matching))
 
-    similarity_results = get_bm25_similarities_old(request.queries, texts, ids)
-    # similarity_results = get_bm25_similarities(request.queries, texts)
+    similarity_results = bm25_index.search(request.queries)
     return {
         "count": len(similarity_results),
         "data": similarity_results
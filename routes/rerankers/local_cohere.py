@@ -0,0 +1,71 @@
+import os
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+import numpy as np
+from jet.vectors.helpers import setup_cohere_model
+
+from helpers.hybrid_search import top_k_indices
+from helpers.rag_reranker import CrossEncoderReranker, get_reranker
+
+
+@dataclass
+class RerankResult:
+    index: int
+    relevance_score: float
+
+
+@dataclass
+class RerankResponse:
+    results: list[RerankResult] = field(default_factory=list)
+    id: Optional[str] = None
+
+
+class LocalCohereReranker:
+    """
+    Offline stand-in for the Cohere client's `rerank`.
+
+    Documents are scored with the resident cross-encoder, which batches
+    pairs and caches their scores, and results are returned in the same
+    shape as Cohere's response (`results[i].index` and
+    `results[i].relevance_score`, best first). The `model` argument is
+    accepted for compatibility and ignored.
+    """
+
+    def __init__(self, reranker: Optional[CrossEncoderReranker] = None):
+        self.reranker = reranker or get_reranker()
+
+    def rerank(
+        self,
+        query: str,
+        documents: Sequence[str],
+        top_n: Optional[int] = None,
+        model: Optional[str] = None,
+        **kwargs,
+    ) -> RerankResponse:
+        scores = np.asarray(self.reranker.score(
+            query, documents), dtype=np.float32)
+        indices = top_k_indices(scores, top_n or len(documents))
+        return RerankResponse(results=[
+            RerankResult(index=int(idx), relevance_score=float(scores[idx]))
+            for idx in indices
+        ])
+
+
+_local_cohere: Optional[LocalCohereReranker] = None
+
+
+def get_cohere_reranker():
+    """
+    Return the reranker backing the /cohere endpoint.
+
+    `COHERE_RERANK_BACKEND=local` selects the offline cross-encoder;
+    anything else keeps Cohere's hosted API.
+    """
+    global _local_cohere
+
+    if os.environ.get("COHERE_RERANK_BACKEND", "cohere") == "local":
+        if _local_cohere is None:
+            _local_cohere = LocalCohereReranker()
+        return _local_cohere
+    return setup_cohere_model()
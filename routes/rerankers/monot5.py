@@ -0,0 +1,117 @@
+from typing import Generator, Optional, Sequence
+
+import numpy as np
+import torch
+
+from helpers.onnx_runtime import OnnxSessionPool, export_quantized, model_name
+
+
+class MonoT5Scorer:
+    """
+    Batched monoT5 relevance scoring.
+
+    Each (query, document) pair is formatted as
+    "Query: q Document: d Relevant:" and scored with a single decoder step:
+    the softmax over the "true" and "false" token logits gives the
+    probability that the document is relevant. Pairs are sorted by length
+    and encoded `batch_size` at a time to keep padding low.
+    """
+
+    def __init__(self, model, tokenizer, batch_size: int = 16, max_length: int = 512):
+        self.model = model.eval()
+        self.tokenizer = tokenizer
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.token_ids = [
+            tokenizer("true", add_special_tokens=False).input_ids[0],
+            tokenizer("false", add_special_tokens=False).input_ids[0],
+        ]
+
+    def score(self, query: str, documents: Sequence[str]) -> np.ndarray:
+        """Return the relevance probability of every document for the query."""
+        texts = [f"Query: {query} Document: {document} Relevant:"
+                 for document in documents]
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        scores = np.empty(len(texts), dtype=np.float32)
+
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            scores[batch] = self._score_batch([texts[idx] for idx in batch])
+
+        return scores
+
+    def _score_batch(self, texts: list[str]) -> np.ndarray:
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="pt",
+        ).to(self.model.device)
+        decoder_input_ids = torch.full(
+            (len(texts), 1), self.model.config.decoder_start_token_id,
+            dtype=torch.long, device=self.model.device)
+
+        with torch.inference_mode():
+            logits = self.model(
+                **inputs, decoder_input_ids=decoder_input_ids).logits
+        probabilities = torch.softmax(
+            logits[:, 0, self.token_ids].float(), dim=-1)[:, 0]
+        return probabilities.cpu().numpy()
+
+    def iter_scores(
+        self,
+        queries: Sequence[str],
+        documents: Sequence[str],
+        chunk_size: int = 256,
+    ) -> Generator[tuple[int, np.ndarray, np.ndarray], None, None]:
+        """Yield (query index, rows, scores) for `chunk_size` documents at a time."""
+        order = np.argsort([len(document) for document in documents], kind="stable")
+        for query_idx, query in enumerate(queries):
+            for start in range(0, len(order), chunk_size):
+                rows = order[start:start + chunk_size]
+                yield query_idx, rows, self.score(query, [documents[idx] for idx in rows])
+
+
+class _MonoT5Graph(torch.nn.Module):
+    """First decoder step of monoT5, returning the "true" and "false" logits."""
+
+    def __init__(self, model, token_ids: list[int]):
+        super().__init__()
+        self.model = model
+        self.token_ids = token_ids
+
+    def forward(self, input_ids, attention_mask):
+        decoder_input_ids = torch.full_like(
+            input_ids[:, :1], self.model.config.decoder_start_token_id)
+        logits = self.model(
+            input_ids=input_ids, attention_mask=attention_mask, decoder_input_ids=decoder_input_ids).logits
+        return logits[:, 0, self.token_ids]
+
+
+class OnnxMonoT5Scorer(MonoT5Scorer):
+    """`MonoT5Scorer` running an int8 ONNX export of the model from a session pool."""
+
+    def __init__(self, model, tokenizer, batch_size: int = 16, max_length: int = 512, pool_size: Optional[int] = None):
+        super().__init__(model, tokenizer, batch_size=batch_size, max_length=max_length)
+        sample = tokenizer(
+            ["Query: query Document: document Relevant:"], return_tensors="pt")
+        path = export_quantized(
+            f"monot5-{model_name(model)}",
+            _MonoT5Graph(self.model, self.token_ids),
+            {"input_ids": sample["input_ids"], "attention_mask": sample["attention_mask"]},
+        )
+        self.pool = OnnxSessionPool(path, size=pool_size)
+
+    def _score_batch(self, texts: list[str]) -> np.ndarray:
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np",
+        )
+        logits = self.pool.run(
+            {"input_ids": inputs["input_ids"], "attention_mask": inputs["attention_mask"]})
+        # softmax(true, false)[true]
+        return (1 / (1 + np.exp(logits[:, 1] - logits[:, 0]))).astype(np.float32)
@@ -0,0 +1,167 @@
+import os
+import re
+from typing import Any, Sequence
+
+import numpy as np
+
+from helpers.hybrid_search import tokenize
+
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_SENTENCE_PATTERN = re.compile(r"[^\n.!?]+[.!?]?")
+
+
+def split_sentences(text: str) -> list[tuple[int, int]]:
+    """Return the (start, end) char spans of the sentences of a text."""
+    spans = []
+    for match in _SENTENCE_PATTERN.finditer(text):
+        start, end = match.span()
+        # Trim surrounding whitespace from the span
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
+    return spans
+
+
+class PhraseIndex:
+    """
+    Positional index of the tokens of a corpus, for phrase matching.
+
+    Every token occurrence of the corpus gets a global position, stored with
+    its term id, char offsets and sentence. Positions are grouped by term in
+    CSR layout, so the occurrences of a phrase are the positions of its first
+    term intersected with the shifted positions of each following term,
+    restricted to matches inside one sentence. Term ids come from the BM25
+    vocabulary of the same corpus.
+    """
+
+    ARRAY_NAMES = (
+        "token_terms", "token_starts", "token_ends", "token_sentences",
+        "doc_indptr", "sentence_starts", "sentence_ends",
+        "term_indptr", "positions",
+    )
+
+    def __init__(self, vocab: dict[str, int], **arrays: np.ndarray):
+        self.vocab = vocab
+        for name in self.ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def build(cls, texts: Sequence[str], vocab: dict[str, int]) -> "PhraseIndex":
+        token_terms: list[int] = []
+        token_starts: list[int] = []
+        token_ends: list[int] = []
+        token_sentences: list[int] = []
+        sentence_starts: list[int] = []
+        sentence_ends: list[int] = []
+        doc_indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+
+        for doc_id, text in enumerate(texts):
+            spans = split_sentences(text)
+            first_sentence = len(sentence_starts)
+            starts = np.asarray([start for start, _ in spans], dtype=np.int64)
+            sentence_starts.extend(start for start, _ in spans)
+            sentence_ends.extend(end for _, end in spans)
+
+            matches = list(_TOKEN_PATTERN.finditer(text))
+            offsets = np.asarray([match.start() for match in matches], dtype=np.int64)
+            sentences = first_sentence + \
+                np.searchsorted(starts, offsets, side="right") - 1
+
+            token_terms.extend(vocab.get(match.group().lower(), -1)
+                               for match in matches)
+            token_starts.extend(offsets.tolist())
+            token_ends.extend(match.end() for match in matches)
+            token_sentences.extend(sentences.tolist())
+            doc_indptr[doc_id + 1] = doc_indptr[doc_id] + len(matches)
+
+        token_terms_array = np.asarray(token_terms, dtype=np.int32)
+        known = np.flatnonzero(token_terms_array >= 0)
+        order = known[np.argsort(token_terms_array[known], kind="stable")]
+        term_indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(token_terms_array[known], minlength=len(vocab)),
+                  out=term_indptr[1:])
+
+        return cls(
+            vocab,
+            token_terms=token_terms_array,
+            token_starts=np.asarray(token_starts, dtype=np.int32),
+            token_ends=np.asarray(token_ends, dtype=np.int32),
+            token_sentences=np.asarray(token_sentences, dtype=np.int32),
+            doc_indptr=doc_indptr,
+            sentence_starts=np.asarray(sentence_starts, dtype=np.int32),
+            sentence_ends=np.asarray(sentence_ends, dtype=np.int32),
+            term_indptr=term_indptr,
+            positions=order.astype(np.int64),
+        )
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        np.savez(os.path.join(directory, "phrases.npz"),
+                 **{name: getattr(self, name) for name in self.ARRAY_NAMES})
+
+    @classmethod
+    def load(cls, directory: str, vocab: dict[str, int]) -> "PhraseIndex":
+        with np.load(os.path.join(directory, "phrases.npz")) as arrays:
+            return cls(vocab, **{name: arrays[name] for name in cls.ARRAY_NAMES})
+
+    def find(self, phrase: str) -> np.ndarray:
+        """Sorted global positions of the first token of every occurrence."""
+        term_ids = [self.vocab.get(term) for term in tokenize(phrase)]
+        if not term_ids or None in term_ids:
+            return np.empty(0, dtype=np.int64)
+
+        positions = self._postings(term_ids[0])
+        for offset, term_id in enumerate(term_ids[1:], start=1):
+            positions = positions[np.isin(
+                positions + offset, self._postings(term_id), assume_unique=True)]
+
+        last = positions + len(term_ids) - 1
+        return positions[self.token_sentences[positions] == self.token_sentences[last]]
+
+    def _postings(self, term_id: int) -> np.ndarray:
+        return self.positions[self.term_indptr[term_id]:self.term_indptr[term_id + 1]]
+
+    def doc_matches(
+        self,
+        doc_id: int,
+        text: str,
+        phrase: str,
+        positions: np.ndarray,
+        score: float,
+    ) -> tuple[int, list[dict[str, Any]]]:
+        """
+        Occurrences of a phrase in one document.
+
+        Args:
+            positions (np.ndarray): The phrase's positions from `find`.
+
+        Returns:
+            tuple[int, list[dict]]: The number of occurrences and one match
+                per sentence containing the phrase, with the sentence's
+                char offsets and the first matched text in it.
+        """
+        lo, hi = np.searchsorted(
+            positions, self.doc_indptr[doc_id:doc_id + 2])
+        doc_positions = positions[lo:hi]
+        if not len(doc_positions):
+            return 0, []
+
+        num_tokens = len(tokenize(phrase))
+        sentences, first = np.unique(
+            self.token_sentences[doc_positions], return_index=True)
+        matches = []
+        for sentence, position in zip(sentences, doc_positions[first]):
+            start = int(self.sentence_starts[sentence])
+            end = int(self.sentence_ends[sentence])
+            matches.append({
+                "score": score,
+                "start_idx": start,
+                "end_idx": end,
+                "sentence": text[start:end],
+                "text": text[self.token_starts[position]:self.token_ends[position + num_tokens - 1]],
+            })
+        return len(doc_positions), matches
@@ -0,0 +1,199 @@
+import json
+import time
+from typing import AsyncGenerator, Generator, Optional, Sequence
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from jet.logger import logger
+from jet.transformers.object import make_serializable
+from jet.vectors.helpers import prepare_sentences
+from starlette.concurrency import run_in_threadpool
+
+from helpers.corpus_cache import Corpus, corpus_cache, get_corpus
+from helpers.hybrid_search import normalize_rows, top_k_indices
+from helpers.rag_reranker import get_reranker
+from .bm25_index import get_bm25_index
+from .heuristic import format_record
+from .reranker_types import PipelineRequest
+from .semantic import get_colbert_model, get_colbert_sentence_index, get_t5_scorer
+
+router = APIRouter()
+
+
+def stage_texts(name: Optional[str], corpus: Corpus) -> list[str]:
+    """The corpus texts a stage scores, one per record."""
+    if name == "bm25":
+        return get_bm25_index(corpus.path, format_record).texts
+    return corpus.view("sentences", prepare_sentences)
+
+
+def score_stage(
+    name: str,
+    queries: Sequence[str],
+    corpus: Corpus,
+    candidates: list[np.ndarray],
+) -> list[np.ndarray]:
+    """Score the candidate rows of each query with one stage."""
+    if name == "bm25":
+        bm25_index = get_bm25_index(corpus.path, format_record)
+        query_scores = bm25_index.index.score_batch(queries)
+        return [query_scores[row, rows] for row, rows in enumerate(candidates)]
+
+    sentences = stage_texts(name, corpus)
+
+    if name == "bi_encoder":
+        sentence_index = get_colbert_sentence_index(corpus.path, sentences)
+        query_embeddings = normalize_rows(np.asarray(
+            get_colbert_model().encode(list(queries), convert_to_numpy=True), dtype=np.float32))
+        return [
+            np.asarray(sentence_index.embeddings[rows]) @ query_embeddings[row]
+            for row, rows in enumerate(candidates)
+        ]
+
+    if name == "cross_encoder":
+        reranker = get_reranker()
+        return [
+            np.asarray(reranker.score(query, [sentences[idx] for idx in rows]), dtype=np.float32)
+            for query, rows in zip(queries, candidates)
+        ]
+
+    if name == "t5":
+        t5_scorer = get_t5_scorer()
+        return [
+            t5_scorer.score(query, [sentences[idx] for idx in rows])
+            for query, rows in zip(queries, candidates)
+        ]
+
+    raise ValueError(f"Unknown stage: {name}")
+
+
+def run_pipeline(
+    request: PipelineRequest,
+    corpus: Corpus,
+) -> Generator[tuple[dict, list[np.ndarray], list[np.ndarray]], None, None]:
+    """
+    Run the stages in order, yielding after each one its report and the
+    surviving candidate rows and scores per query.
+    """
+    candidates = [np.arange(len(corpus.data)) for _ in request.queries]
+    scores = [np.zeros(len(corpus.data), dtype=np.float32)
+              for _ in request.queries]
+
+    for stage in request.stages:
+        stage_start = time.perf_counter()
+        num_candidates = sum(len(rows) for rows in candidates)
+        stage_scores = score_stage(
+            stage.name, request.queries, corpus, candidates)
+
+        for row, row_scores in enumerate(stage_scores):
+            keep = top_k_indices(row_scores, stage.top_k)
+            candidates[row] = candidates[row][keep]
+            scores[row] = row_scores[keep]
+
+        report = {
+            "name": stage.name,
+            "top_k": stage.top_k,
+            "candidates": num_candidates,
+            "elapsed": time.perf_counter() - stage_start,
+        }
+        yield report, candidates, scores
+
+
+def format_candidates(
+    corpus: Corpus,
+    texts: list[str],
+    candidates: list[np.ndarray],
+    scores: list[np.ndarray],
+    limit: Optional[int] = None,
+) -> list[dict]:
+    return [
+        {
+            "score": float(score),
+            "similarity": float(score),
+            "matched": [texts[idx]],
+            "result": corpus.data[idx]
+        }
+        for rows, row_scores in zip(candidates, scores)
+        for idx, score in zip(rows[:limit], row_scores[:limit])
+    ]
+
+
+@router.post("/pipeline")
+async def reranker_pipeline(request: PipelineRequest, http_request: Request):
+    """
+    Rerank with a chain of stages, each keeping its top_k candidates per
+    query for the next one, e.g. BM25 to 1000, bi-encoder to 100 and
+    cross-encoder to 10. All stages share one cached copy of the corpus.
+
+    With `stream`, a "stage" NDJSON line with the current best 10 per query
+    follows each stage and the client disconnecting stops the remaining ones.
+    """
+    try:
+        start_time = time.perf_counter()
+        corpus = get_corpus(request.data_file)
+        stages_iter = run_pipeline(request, corpus)
+        # Results show the text the last stage scored
+        last_stage = request.stages[-1].name if request.stages else None
+
+        if request.stream:
+            async def event_stream() -> AsyncGenerator[str, None]:
+                candidates, scores = [], []
+                try:
+                    while True:
+                        if await http_request.is_disconnected():
+                            logger.warning(
+                                "Client disconnected; stopping pipeline")
+                            return
+                        stage = await run_in_threadpool(next, stages_iter, None)
+                        if stage is None:
+                            break
+                        report, candidates, scores = stage
+                        results = format_candidates(
+                            corpus, stage_texts(report["name"], corpus), candidates, scores, limit=10)
+                        yield json.dumps(make_serializable({
+                            "event": "stage", **report, "count": len(results), "data": results})) + "\n"
+
+                    results = format_candidates(
+                        corpus, stage_texts(last_stage, corpus), candidates, scores)
+                    yield json.dumps(make_serializable({
+                        "event": "final",
+                        "count": len(results),
+                        "data": results,
+                        "elapsed": time.perf_counter() - start_time,
+                    })) + "\n"
+                except Exception as e:
+                    logger.error(f"Pipeline stream failed: {e}")
+                    yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+                finally:
+                    # Stop the pipeline; a stage still running in the worker
+                    # thread finishes, but no later stage is started
+                    try:
+                        stages_iter.close()
+                    except ValueError:
+                        pass
+
+            return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+        stages = []
+        candidates, scores = [], []
+        for report, candidates, scores in stages_iter:
+            stages.append(report)
+        results = format_candidates(
+            corpus, stage_texts(last_stage, corpus), candidates, scores)
+
+        return {
+            "count": len(results),
+            "data": results,
+            "stages": stages,
+            "elapsed": time.perf_counter() - start_time,
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
+@router.get("/corpus/cache")
+async def get_corpus_cache_stats():
+    """Per-corpus memory use and hit rate of the shared corpus cache."""
+    return corpus_cache.stats()
@@ -1,5 +1,5 @@
-from typing import Optional
-from pydantic import BaseModel
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
 from shared.data_types.job import JobData
 
 
@@ -14,6 +14,20 @@ class Match(BaseModel):
 class SimilarityRequest(BaseModel):
     queries: list[str]
     data_file: str = "/Users/jethroestrada/Desktop/External_Projects/Jet_Apps/my-jobs/saved/jobs.json"
+    stream: bool = False  # Stream NDJSON top-k snapshots while scoring
+
+
+class PipelineStage(BaseModel):
+    name: Literal["bm25", "bi_encoder", "cross_encoder", "t5"]
+    top_k: int = Field(gt=0, description="Candidates kept per query")
+
+
+class PipelineRequest(SimilarityRequest):
+    stages: list[PipelineStage] = [
+        PipelineStage(name="bm25", top_k=1000),
+        PipelineStage(name="bi_encoder", top_k=100),
+        PipelineStage(name="cross_encoder", top_k=10),
+    ]
 
 
 class SimilarityData(BaseModel):
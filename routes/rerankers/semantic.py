@@ -1,72 +1,109 @@
-from fastapi import APIRouter, HTTPException
-from jet.file.utils import load_file
+from fastapi import APIRouter, HTTPException, Request
 from jet.search.formatters import clean_string
 from pydantic import BaseModel
-from typing import List
+from typing import Iterator, List, Optional
 from jet.wordnet.words import get_words
 from shared.data_types.job import JobData
-from sentence_transformers import SentenceTransformer, CrossEncoder, util
-from jet.file.utils import load_file
+from sentence_transformers import SentenceTransformer, CrossEncoder
 from jet.vectors.helpers import (
     prepare_sentences,
     setup_colbert_model,
-    setup_bert_model,
-    setup_cohere_model,
     setup_t5_model,
 )
-import torch
+import numpy as np
+from helpers.corpus_cache import get_corpus
+from helpers.onnx_runtime import OnnxBiEncoder, get_reranker_runtime
+from helpers.rag_reranker import get_reranker
+from .embedding_index import SentenceEmbeddingIndex, get_sentence_embeddings
+from .local_cohere import get_cohere_reranker
+from .monot5 import MonoT5Scorer, OnnxMonoT5Scorer
 from .reranker_types import (
     SimilarityRequest,
     SimilarityResult,
 )
+from .streaming import ScoreBatch, collect_ranking, stream_ranking
 
 router = APIRouter()
 
 PHRASE_MODEL_PATH = "/Users/jethroestrada/Desktop/External_Projects/Jet_Projects/JetScripts/wordnet/generated/gensim_jet_phrase_model.pkl"
 
+colbert_model = None
+
+
+def get_colbert_model():
+    global colbert_model
+
+    if colbert_model is None:
+        colbert_model = setup_colbert_model()
+        if get_reranker_runtime() == "onnx":
+            colbert_model = OnnxBiEncoder(colbert_model)
+    return colbert_model
+
+
+def get_colbert_sentence_index(data_file: str, sentences: list[str]) -> SentenceEmbeddingIndex:
+    """ColBERT embeddings of the sentences of a data file, encoded once per file version."""
+    model = get_colbert_model()
+    return get_sentence_embeddings(
+        data_file, f"colbert-{get_reranker_runtime()}", sentences,
+        lambda texts: model.encode(texts, batch_size=64, convert_to_numpy=True))
+
+
+t5_scorer = None
+
+
+def get_t5_scorer() -> MonoT5Scorer:
+    global t5_scorer
+
+    if t5_scorer is None:
+        t5_model, t5_tokenizer = setup_t5_model()
+        scorer_class = OnnxMonoT5Scorer if get_reranker_runtime() == "onnx" else MonoT5Scorer
+        t5_scorer = scorer_class(t5_model, t5_tokenizer)
+    return t5_scorer
+
+
+def rank_sentences(
+    request: SimilarityRequest,
+    http_request: Request,
+    batches: Iterator[ScoreBatch],
+    data: list,
+    sentences: list[str],
+    num_groups: Optional[int] = None,
+    total: Optional[int] = None,
+    top_k: int = 10,
+):
+    """Collect or stream the top_k sentences per query from score batches."""
+    def format_result(query_idx: int, idx: int, score: float) -> dict:
+        return {
+            "score": score,
+            "similarity": score,
+            "matched": [sentences[idx]],
+            "result": data[idx]
+        }
+
+    num_groups = num_groups or len(request.queries)
+    if request.stream:
+        return stream_ranking(http_request, batches, num_groups, format_result, top_k=top_k, total=total)
+    return collect_ranking(batches, num_groups, format_result, top_k=top_k)
+
 
 # **BERT-Based Reranker Similarity Endpoint**
 @router.post("/bert", response_model=SimilarityResult)
-async def bert_reranker(request: SimilarityRequest):
+async def bert_reranker(request: SimilarityRequest, http_request: Request):
     try:
-        global bert_model
-        bert_model = setup_bert_model()  # Ensure the model is initialized
-
-        if bert_model is None:
+        reranker = get_reranker()
+        if reranker.model is None:
             raise ValueError("BERT model failed to initialize.")
 
-        data = load_file(request.data_file)
+        corpus = get_corpus(request.data_file)
+        data = corpus.data
 
         # Prepare sentences (assumes job descriptions are in data)
-        sentences = prepare_sentences(data)
-
-        # Create query-document pairs for scoring
-        pairs = [(query, sentence)
-                 for query in request.queries for sentence in sentences]
-
-        # Compute similarity scores
-        scores = bert_model.predict(pairs)
-
-        # Match scores with sentences
-        results = []
-        index = 0
-        for query in request.queries:
-            query_results = []
-            for i, sentence in enumerate(sentences):
-                score = scores[index]
-                index += 1
-                query_results.append({
-                    "score": score,
-                    "similarity": score,
-                    "matched": [sentence],
-                    "result": data[i]
-                })
-
-            # Sort results per query
-            query_results.sort(key=lambda x: x["score"], reverse=True)
-            results.extend(query_results[:10])  # Keep top 10 matches
-
-        return {"count": len(results), "data": results}
+        sentences = corpus.view("sentences", prepare_sentences)
+
+        # Score in length-bucketed micro-batches, keeping the top 10 per query
+        batches = reranker.iter_scores(request.queries, sentences)
+        return rank_sentences(request, http_request, batches, data, sentences,
+                              total=len(request.queries) * len(sentences))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -74,33 +111,21 @@ async def bert_reranker(request: SimilarityRequest):
 
 # **ColBERT Similarity Endpoint**
 @router.post("/colbert", response_model=SimilarityResult)
-async def colbert_reranker(request: SimilarityRequest):
+async def colbert_reranker(request: SimilarityRequest, http_request: Request):
     try:
-        colbert_model = setup_colbert_model()
-        data = load_file(request.data_file)
-        sentences = prepare_sentences(data)
+        colbert_model = get_colbert_model()
+        corpus = get_corpus(request.data_file)
+        data = corpus.data
+        sentences = corpus.view("sentences", prepare_sentences)
 
-        # Encode sentences & queries
-        sentence_embeddings = colbert_model.encode(
-            sentences, convert_to_tensor=True)
+        sentence_index = get_colbert_sentence_index(
+            request.data_file, sentences)
         query_embeddings = colbert_model.encode(
-            request.queries, convert_to_tensor=True)
-
-        # Compute similarity scores
-        similarities = util.cos_sim(query_embeddings, sentence_embeddings)
-        top_results = similarities.argsort(descending=True)
-
-        results = [
-            {
-                "score": similarities[0, idx].item(),
-                "similarity": similarities[0, idx].item(),
-                "matched": [sentences[idx]],
-                "result": data[idx]
-            }
-            for idx in top_results[0][:10]
-        ]
+            request.queries, convert_to_numpy=True)
 
-        return {"count": len(results), "data": results}
+        batches = sentence_index.iter_scores(query_embeddings)
+        return rank_sentences(request, http_request, batches, data, sentences,
+                              total=len(request.queries) * len(sentences))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -108,77 +133,44 @@ async def colbert_reranker(request: SimilarityRequest):
 
 # **Cohere Reranker Similarity Endpoint**
 @router.post("/cohere", response_model=SimilarityResult)
-async def cohere_reranker(request: SimilarityRequest):
+async def cohere_reranker(request: SimilarityRequest, http_request: Request):
     try:
-        cohere_model = setup_cohere_model()
-        data = load_file(request.data_file)
-        sentences = prepare_sentences(data)
-
-        # Call Cohere's reranker API
-        response = cohere_model.rerank(
-            query=request.queries[0], documents=sentences, top_n=10, model="rerank-english-v2.0")
-
-        results = [
-            {
-                "score": result.relevance_score,
-                "similarity": result.relevance_score,
-                "matched": [sentences[result.index]],
-                "result": data[result.index]
-            }
-            for result in response.results
-        ]
-
-        return {"count": len(results), "data": results}
+        cohere_model = get_cohere_reranker()
+        corpus = get_corpus(request.data_file)
+        data = corpus.data
+        sentences = corpus.view("sentences", prepare_sentences)
+
+        def batches():
+            # Call Cohere's reranker API
+            response = cohere_model.rerank(
+                query=request.queries[0], documents=sentences, top_n=10, model="rerank-english-v2.0")
+            yield (
+                0,
+                np.array([result.index for result in response.results]),
+                np.array([result.relevance_score for result in response.results]),
+            )
+
+        return rank_sentences(request, http_request, batches(), data, sentences,
+                              num_groups=1, total=len(sentences))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
 @router.post("/t5", response_model=SimilarityResult)
-async def t5_reranker(request: SimilarityRequest):
+async def t5_reranker(request: SimilarityRequest, http_request: Request):
     try:
-        # Load model and tokenizer
-        t5_model, t5_tokenizer = setup_t5_model()
+        t5_scorer = get_t5_scorer()
 
         # Load job data
-        data = load_file(request.data_file)
-        sentences = prepare_sentences(data)
-
-        results = []
-
-        # Process each query
-        for query in request.queries:
-            scores = []
-
-            for idx, sentence in enumerate(sentences):
-                input_text = f"Query: {query} Document: {sentence} Relevant:"
-                inputs = t5_tokenizer(input_text, return_tensors="pt")
-
-                # Generate score
-                with torch.no_grad():
-                    output = t5_model.generate(**inputs, max_length=2)
-
-                # Convert output to score (0 or 1)
-                score = torch.sigmoid(torch.tensor(float(output[0][0]))).item()
-                scores.append((score, idx))
-
-            # Sort by highest score
-            scores.sort(reverse=True, key=lambda x: x[0])
-
-            # Format results
-            query_results = [
-                {
-                    "score": score,
-                    "similarity": score,
-                    "matched": [sentences[idx]],
-                    "result": data[idx]
-                }
-                for score, idx in scores[:10]  # Return top 10 results
-            ]
-
-            results.extend(query_results)
-
-        return {"count": len(results), "data": results}
+        corpus = get_corpus(request.data_file)
+        data = corpus.data
+        sentences = corpus.view("sentences", prepare_sentences)
+
+        # Score all sentences of each query in padded batches
+        batches = t5_scorer.iter_scores(request.queries, sentences)
+        return rank_sentences(request, http_request, batches, data, sentences,
+                              total=len(request.queries) * len(sentences))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
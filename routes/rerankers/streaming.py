@@ -0,0 +1,123 @@
+import json
+from typing import Any, AsyncGenerator, Callable, Iterator, Optional
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from jet.logger import logger
+from jet.transformers.object import make_serializable
+from starlette.concurrency import run_in_threadpool
+
+from helpers.hybrid_search import top_k_indices
+
+
+# (group, rows, scores): scores of some corpus rows for one group (query)
+ScoreBatch = tuple[int, np.ndarray, np.ndarray]
+FormatResult = Callable[[int, int, float], dict[str, Any]]
+
+
+class TopKAccumulator:
+    """Running top-k rows per group over a stream of score batches."""
+
+    def __init__(self, num_groups: int, top_k: Optional[int] = None):
+        self.top_k = top_k
+        self.rows = [np.empty(0, dtype=np.int64) for _ in range(num_groups)]
+        self.scores = [np.empty(0, dtype=np.float32)
+                       for _ in range(num_groups)]
+
+    def add(self, group: int, rows: np.ndarray, scores: np.ndarray) -> None:
+        rows = np.concatenate([self.rows[group], np.asarray(rows, dtype=np.int64)])
+        scores = np.concatenate(
+            [self.scores[group], np.asarray(scores, dtype=np.float32)])
+        keep = top_k_indices(scores, self.top_k or len(scores))
+        self.rows[group] = rows[keep]
+        self.scores[group] = scores[keep]
+
+    def ranking(self, format_result: FormatResult, limit: Optional[int] = None) -> list[dict[str, Any]]:
+        """Formatted results, per group in order, best first."""
+        return [
+            format_result(group, int(row), float(score))
+            for group, (rows, scores) in enumerate(zip(self.rows, self.scores))
+            for row, score in zip(rows[:limit], scores[:limit])
+        ]
+
+
+def collect_ranking(
+    batches: Iterator[ScoreBatch],
+    num_groups: int,
+    format_result: FormatResult,
+    top_k: Optional[int] = None,
+) -> dict[str, Any]:
+    accumulator = TopKAccumulator(num_groups, top_k)
+    for group, rows, scores in batches:
+        accumulator.add(group, rows, scores)
+    results = accumulator.ranking(format_result)
+    return {"count": len(results), "data": results}
+
+
+def stream_ranking(
+    http_request: Request,
+    batches: Iterator[ScoreBatch],
+    num_groups: int,
+    format_result: FormatResult,
+    top_k: Optional[int] = None,
+    total: Optional[int] = None,
+    snapshot_k: int = 10,
+) -> StreamingResponse:
+    """
+    Stream a ranking as NDJSON while it is being scored.
+
+    A "snapshot" line with the current best `snapshot_k` results per group
+    is emitted after each scored batch and a "final" line with the complete
+    ranking at the end. `total` is the number of scores to expect, for
+    progress reporting. Batches are pulled in a worker thread and scoring
+    stops as soon as the client disconnects.
+    """
+    async def event_stream() -> AsyncGenerator[str, None]:
+        accumulator = TopKAccumulator(num_groups, top_k)
+        scored = 0
+        try:
+            while True:
+                if await http_request.is_disconnected():
+                    logger.warning(
+                        f"Client disconnected after {scored} scores; stopping")
+                    return
+
+                batch = await run_in_threadpool(next, batches, None)
+                if batch is None:
+                    break
+
+                group, rows, scores = batch
+                accumulator.add(group, rows, scores)
+                scored += len(rows)
+                results = accumulator.ranking(format_result, limit=snapshot_k)
+                yield json.dumps(make_serializable({
+                    "event": "snapshot",
+                    "scored": scored,
+                    "total": total,
+                    "count": len(results),
+                    "data": results,
+                })) + "\n"
+
+            results = accumulator.ranking(format_result)
+            yield json.dumps(make_serializable({
+                "event": "final",
+                "scored": scored,
+                "total": total,
+                "count": len(results),
+                "data": results,
+            })) + "\n"
+        except Exception as e:
+            logger.error(f"Ranking stream failed: {e}")
+            yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+        finally:
+            # Stop the scoring generator; a batch still running in the
+            # worker thread finishes, but no further batch is scored
+            close = getattr(batches, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except ValueError:
+                    pass
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
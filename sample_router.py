@@ -3,18 +3,18 @@ from fastapi.routing import APIRouter
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from deeplake.core.vectorstore import VectorStore
-from jet.llm.utils.embeddings import get_ollama_embedding_function
 from jet.llm.utils.llama_index_utils import display_jet_source_nodes
 from jet.logger import logger
 from jet.transformers.formatters import format_json
 from llama_index.core.schema import NodeWithScore, TextNode
+from helpers.embedding_scheduler import get_scheduled_embedding_function
 
 # FastAPI router
 router = APIRouter()
 
 # Configuration
 VECTOR_STORE_PATH = "/Users/jethroestrada/Desktop/External_Projects/Jet_Projects/JetScripts/llm/semantic_search/generated/deeplake/store_1"
-EMBEDDING_FUNCTION = get_ollama_embedding_function("mxbai-embed-large")
+EMBEDDING_FUNCTION = get_scheduled_embedding_function("mxbai-embed-large")
 
 vector_store: Optional["VectorStore"] = None
 
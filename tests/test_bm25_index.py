@@ -0,0 +1,93 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("jet")
+pytest.importorskip("llama_index.core")
+
+from routes.rerankers import bm25_index
+from routes.rerankers.bm25_index import formatter_id, get_bm25_index
+
+
+def format_title(record):
+    return record["title"]
+
+
+def format_upper(record):
+    return record["title"].upper()
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "bm25"
+    directory.mkdir()
+    monkeypatch.setattr(bm25_index, "BM25_CACHE_DIR", str(directory))
+    monkeypatch.setattr(bm25_index, "_indexes", bm25_index.LRUCache(max_size=4))
+    return directory
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps([{"title": "quick brown fox"}, {"title": "lazy dog"}]))
+    return path
+
+
+def index_dirs(cache_dir):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), cache_dir)
+        for root, dirs, _ in os.walk(cache_dir) for name in dirs
+    )
+
+
+def test_formatter_id_changes_with_the_code():
+    assert formatter_id(format_title) == formatter_id(format_title)
+    assert formatter_id(format_title) != formatter_id(format_upper)
+
+
+def test_indexes_are_kept_per_formatter(cache_dir, data_file):
+    titles = get_bm25_index(str(data_file), format_title)
+    upper = get_bm25_index(str(data_file), format_upper)
+
+    assert titles.texts == ["quick brown fox", "lazy dog"]
+    assert upper.texts == ["QUICK BROWN FOX", "LAZY DOG"]
+    assert get_bm25_index(str(data_file), format_title) is titles
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_persisted_index_is_reloaded(cache_dir, data_file, monkeypatch):
+    get_bm25_index(str(data_file), format_title)
+    monkeypatch.setattr(bm25_index, "_indexes", bm25_index.LRUCache(max_size=4))
+    monkeypatch.setattr(bm25_index.CorpusBM25Index, "build", None)
+
+    assert get_bm25_index(str(data_file), format_title).texts == ["quick brown fox", "lazy dog"]
+
+
+def test_new_file_versions_replace_older_indexes(cache_dir, data_file):
+    get_bm25_index(str(data_file), format_title)
+    (source_dir,) = os.listdir(cache_dir)
+    (first_version,) = os.listdir(cache_dir / source_dir)
+
+    data_file.write_text(json.dumps([{"title": "a different corpus"}]))
+    assert get_bm25_index(str(data_file), format_title).texts == ["a different corpus"]
+
+    versions = os.listdir(cache_dir / source_dir)
+    assert len(versions) == 1 and versions != [first_version]
+
+
+def test_index_version_bump_rebuilds_and_drops_flat_layout(cache_dir, data_file, monkeypatch):
+    legacy = cache_dir / "legacy"
+    legacy.mkdir()
+    (legacy / "corpus.json").write_text("{}")
+
+    get_bm25_index(str(data_file), format_title)
+    before = index_dirs(cache_dir)
+    assert not legacy.exists()
+
+    monkeypatch.setattr(bm25_index, "INDEX_VERSION", bm25_index.INDEX_VERSION + 1)
+    get_bm25_index(str(data_file), format_title)
+
+    after = index_dirs(cache_dir)
+    assert len(after) == len(before) == 2
+    assert after != before
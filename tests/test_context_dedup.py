@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+
+from llama_index.core.schema import NodeRelationship, NodeWithScore, RelatedNodeInfo, TextNode
+
+from helpers.context_dedup import (
+    dedupe_contexts,
+    dedupe_nodes,
+    find_near_duplicates,
+    remove_contained_spans,
+    remove_contained_texts,
+)
+
+
+def remove_substrings_naive(contexts: list[str]) -> list[str]:
+    result = []
+    for context in sorted(contexts, key=len, reverse=True):
+        if not any(context in other for other in result):
+            result.append(context)
+    return result
+
+
+def test_contained_texts_match_pairwise_scan():
+    random.seed(0)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta"]
+    documents = [" ".join(random.choices(words, k=80)) for _ in range(20)]
+    contexts = list(documents)
+    for document in documents:
+        for size in [120, 40, 10]:
+            start = random.randint(0, len(document) - size)
+            contexts.append(document[start:start + size])
+    random.shuffle(contexts)
+
+    assert dedupe_contexts(contexts) == remove_substrings_naive(contexts)
+
+
+def test_dedupe_contexts_does_not_modify_input():
+    contexts = ["short", "a much longer context with short inside"]
+    original = list(contexts)
+
+    assert dedupe_contexts(contexts) == [contexts[1]]
+    assert contexts == original
+
+
+def test_equal_texts_keep_the_first():
+    texts = ["same text", "same text", "other"]
+
+    assert sorted(remove_contained_texts(texts)) == [0, 2]
+
+
+def test_near_duplicates_drop_later_texts():
+    base = " ".join(f"word{idx}" for idx in range(200))
+    texts = [base, base + " extra", "completely different words here"]
+
+    assert find_near_duplicates(texts, threshold=0.9) == {1}
+
+
+def test_spans_within_a_source_are_dropped():
+    source = RelatedNodeInfo(node_id="doc")
+    outer = TextNode(id_="outer", text="outer text", start_char_idx=0, end_char_idx=100,
+                     relationships={NodeRelationship.SOURCE: source})
+    inner = TextNode(id_="inner", text="inner", start_char_idx=10, end_char_idx=50,
+                     relationships={NodeRelationship.SOURCE: source})
+    other = TextNode(id_="other", text="no offsets")
+    nodes = [NodeWithScore(node=inner, score=0.9), NodeWithScore(node=outer, score=0.5),
+             NodeWithScore(node=other, score=0.1)]
+
+    assert remove_contained_spans(nodes) == [1, 2]
+
+
+def test_children_of_retrieved_parents_are_dropped():
+    parent = TextNode(id_="parent", text="parent text and more")
+    child = TextNode(id_="child", text="child",
+                     relationships={NodeRelationship.PARENT: RelatedNodeInfo(node_id="parent")})
+    nodes = [NodeWithScore(node=child, score=0.9), NodeWithScore(node=parent, score=0.5)]
+
+    assert [item.node.node_id for item in dedupe_nodes(nodes)] == ["parent"]
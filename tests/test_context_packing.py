@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("jet")
+pytest.importorskip("llama_index.core")
+
+from helpers import context_packing
+from helpers.context_packing import OLLAMA_DEFAULT_NUM_CTX, get_context_window
+
+
+@pytest.fixture
+def model_info(monkeypatch):
+    calls = []
+    responses = {}
+
+    def fake_get_model_info(model):
+        calls.append(model)
+        response = responses[model]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(context_packing, "_get_model_info", fake_get_model_info)
+    monkeypatch.setattr(context_packing, "_failed_lookups", {})
+    return responses, calls
+
+
+def test_uses_ollama_default_without_num_ctx(model_info):
+    responses, _ = model_info
+    responses["model"] = {"model_info": {"llama.context_length": 131072}}
+
+    assert get_context_window("model") == OLLAMA_DEFAULT_NUM_CTX
+
+
+def test_uses_model_num_ctx_capped_by_context_length(model_info):
+    responses, _ = model_info
+    responses["small"] = {"parameters": "num_ctx 8192", "model_info": {"llama.context_length": 4096}}
+    responses["large"] = {"parameters": "stop <eos>\nnum_ctx 8192", "model_info": {"llama.context_length": 131072}}
+
+    assert get_context_window("small") == 4096
+    assert get_context_window("large") == 8192
+
+
+def test_failed_lookups_are_not_retried_immediately(model_info):
+    responses, calls = model_info
+    responses["model"] = ConnectionError("refused")
+
+    assert get_context_window("model") == OLLAMA_DEFAULT_NUM_CTX
+    assert get_context_window("model") == OLLAMA_DEFAULT_NUM_CTX
+    assert calls == ["model"]
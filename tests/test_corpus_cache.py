@@ -0,0 +1,75 @@
+import json
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("jet")
+
+from helpers.corpus_cache import CorpusCache, build_id_map, estimate_size
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps([{"id": "a", "title": "first"}, {"id": "b", "title": "second"}]))
+    return path
+
+
+def test_estimate_size_counts_shared_objects_once():
+    records = [{"id": str(idx), "text": "x" * 1000} for idx in range(10)]
+    seen: set[int] = set()
+    records_size = estimate_size(records, seen)
+
+    id_map = build_id_map(records)
+    assert estimate_size(id_map, seen) < records_size / 4
+    assert estimate_size(id_map) > records_size / 2
+
+
+def test_id_map_view_is_counted_without_its_records(data_file):
+    corpus = CorpusCache().get(str(data_file))
+    before = corpus.nbytes
+
+    assert corpus.id_map["b"]["title"] == "second"
+    assert corpus.nbytes - before <= sys.getsizeof(corpus.id_map)
+
+
+def test_views_are_built_once_and_outside_the_corpus_lock(data_file):
+    corpus = CorpusCache().get(str(data_file))
+    calls = []
+    started = threading.Event()
+
+    def slow_build(data):
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return [record["title"] for record in data]
+
+    threads = [threading.Thread(target=corpus.view, args=("titles", slow_build)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+
+    start_time = time.perf_counter()
+    assert corpus.view("ids", lambda data: [record["id"] for record in data]) == ["a", "b"]
+    assert time.perf_counter() - start_time < 0.1
+
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert corpus.view("titles", slow_build) == ["first", "second"]
+
+
+def test_reloads_when_the_file_changes(data_file):
+    cache = CorpusCache()
+    first = cache.get(str(data_file))
+    assert cache.get(str(data_file)) is first
+
+    data_file.write_text(json.dumps([{"id": "c"}]))
+    second = cache.get(str(data_file))
+
+    assert second is not first
+    assert second.data == [{"id": "c"}]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
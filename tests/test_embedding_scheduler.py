@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip("jet")
+
+from helpers.embedding_scheduler import EmbeddingScheduler, FakeEmbeddingBackend
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(backend, **kwargs):
+        scheduler = EmbeddingScheduler(backend, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.close()
+
+
+def test_embeds_duplicates_once(make_scheduler):
+    backend = FakeEmbeddingBackend()
+    scheduler = make_scheduler(backend, max_wait=0.05)
+
+    futures = [scheduler.submit(text) for text in ["a", "b", "a"]]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert results[0] == results[2] == backend.embed_one("a")
+    assert results[1] == backend.embed_one("b")
+    assert scheduler.stats()["deduplicated"] == 1
+
+
+def test_short_backend_response_fails_every_future(make_scheduler):
+    scheduler = make_scheduler(lambda texts: [[0.0]] * (len(texts) - 1), max_wait=0.05)
+
+    futures = [scheduler.submit(text) for text in ["a", "b", "c"]]
+
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+
+
+def test_batch_size_halves_to_floor_and_recovers(make_scheduler):
+    scheduler = make_scheduler(FakeEmbeddingBackend(), max_batch_size=64,
+                               min_batch_size=8, target_latency=0.5)
+
+    for _ in range(5):
+        scheduler._adapt_batch_size(scheduler.batch_size, latency=1.0)
+    assert scheduler.batch_size == 8
+
+    scheduler._adapt_batch_size(8, latency=0.45)
+    assert scheduler.batch_size == 8
+
+    scheduler._adapt_batch_size(8, latency=0.1)
+    assert scheduler.batch_size == 10
@@ -0,0 +1,30 @@
+import pytest
+
+from helpers.fusion import reciprocal_rank_fusion
+
+
+def test_items_ranked_by_several_lists_come_first():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "d"]], k=60)
+
+    assert [item for item, _ in fused] == ["b", "c", "a", "d"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_deduplicates_by_key_keeping_the_first_item():
+    first = {"id": 1, "source": "dense"}
+    second = {"id": 1, "source": "sparse"}
+
+    fused = reciprocal_rank_fusion([[first], [second]], key=lambda item: item["id"])
+
+    assert fused == [(first, pytest.approx(2 / 61))]
+
+
+def test_top_k_limits_the_result():
+    fused = reciprocal_rank_fusion([["a", "b", "c"]], top_k=2)
+
+    assert [item for item, _ in fused] == ["a", "b"]
+
+
+def test_empty_rankings():
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([[], []]) == []
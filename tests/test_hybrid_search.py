@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("jet")
+pytest.importorskip("llama_index.core")
+
+from helpers.hybrid_search import BM25Index, min_max_normalize, top_k_indices
+
+TEXTS = [
+    "The quick brown fox jumps over the lazy dog",
+    "A quick brown dog outpaces a quick red fox",
+    "Python developers write tests for their code",
+    "Lazy afternoons are for reading",
+]
+
+
+def test_score_ranks_matching_documents():
+    index = BM25Index.build(TEXTS)
+
+    scores = index.score("quick fox")
+
+    assert scores.shape == (len(TEXTS),)
+    assert set(np.flatnonzero(scores)) == {0, 1}
+    assert scores[1] > scores[0]
+
+
+def test_score_batch_matches_score():
+    index = BM25Index.build(TEXTS)
+    queries = ["quick fox", "lazy", "tests code python", "unknown words", "fox fox"]
+
+    batch = index.score_batch(queries)
+
+    for row, query in enumerate(queries):
+        np.testing.assert_allclose(batch[row], index.score(query), rtol=1e-6)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = BM25Index.build(TEXTS)
+    index.save(str(tmp_path))
+
+    loaded = BM25Index.load(str(tmp_path))
+
+    np.testing.assert_array_equal(loaded.score("lazy dog"), index.score("lazy dog"))
+
+
+def test_top_k_indices_are_best_first():
+    scores = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+
+    assert top_k_indices(scores, 2).tolist() == [1, 3]
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 0]
+
+
+def test_min_max_normalize_constant_scores():
+    assert min_max_normalize(np.ones(3, dtype=np.float32)).tolist() == [0.0, 0.0, 0.0]
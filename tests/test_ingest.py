@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip("jet")
+pytest.importorskip("llama_index.core")
+
+from helpers.ingest import can_ingest_parallel, ingest_status, load_documents_parallel
+
+
+@pytest.fixture
+def text_dir(tmp_path):
+    (tmp_path / "b.md").write_text("# B\nsecond")
+    (tmp_path / "a.md").write_text("# A\nfirst")
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "c.rst").write_text("third")
+    (tmp_path / "records.json").write_text('[{"title": "ignored"}]')
+    return tmp_path
+
+
+def test_default_json_attributes_keep_the_parallel_path(text_dir):
+    assert can_ingest_parallel(
+        str(text_dir), extensions=[".md", ".rst"], json_attributes=["title", "details"])
+
+
+def test_json_extensions_and_hierarchy_take_the_sequential_path(text_dir):
+    assert not can_ingest_parallel(str(text_dir), extensions=[".md", ".json"])
+    assert not can_ingest_parallel(str(text_dir), extensions=[".md"], split_mode=["hierarchy"])
+    assert not can_ingest_parallel(str(text_dir / "a.md"), extensions=[".md"])
+
+
+def test_load_documents_parallel_is_ordered_by_path(text_dir):
+    documents = load_documents_parallel(str(text_dir), [".md", ".rst"], max_workers=2)
+
+    assert [document.metadata["file_name"] for document in documents] == ["a.md", "b.md", "c.rst"]
+    assert ingest_status[str(text_dir)]["state"] == "done"
+    assert ingest_status[str(text_dir)]["parsed"] == 3
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("jet")
+pytest.importorskip("llama_index.core")
+
+from helpers.hybrid_search import BM25Index
+from routes.rerankers.phrase_index import PhraseIndex, split_sentences
+
+TEXTS = [
+    "The quick brown fox. A brown fox sleeps!",
+    "Quick brown dogs run. The fox is quick",
+    "Nothing to see here",
+]
+
+
+@pytest.fixture
+def phrase_index():
+    return PhraseIndex.build(TEXTS, BM25Index.build(TEXTS).vocab)
+
+
+def test_split_sentences_trims_whitespace():
+    text = "  First one.  Second one!\nThird"
+
+    assert [text[start:end] for start, end in split_sentences(text)] == [
+        "First one.", "Second one!", "Third"]
+
+
+def test_finds_phrase_occurrences(phrase_index):
+    assert len(phrase_index.find("brown fox")) == 2
+    assert len(phrase_index.find("quick brown")) == 2
+    assert len(phrase_index.find("fox brown")) == 0
+    assert len(phrase_index.find("unknown words")) == 0
+
+
+def test_phrases_do_not_match_across_sentences(phrase_index):
+    # "fox. A" spans the end of one sentence and the start of the next
+    assert len(phrase_index.find("fox a")) == 0
+
+
+def test_doc_matches_report_sentences_and_text(phrase_index):
+    positions = phrase_index.find("brown fox")
+
+    count, matches = phrase_index.doc_matches(0, TEXTS[0], "brown fox", positions, score=1.0)
+
+    assert count == 2
+    assert [match["sentence"] for match in matches] == ["The quick brown fox.", "A brown fox sleeps!"]
+    assert [match["text"] for match in matches] == ["brown fox", "brown fox"]
+    assert phrase_index.doc_matches(2, TEXTS[2], "brown fox", positions, score=1.0) == (0, [])
+
+
+def test_save_and_load_round_trip(phrase_index, tmp_path):
+    phrase_index.save(str(tmp_path))
+    loaded = PhraseIndex.load(str(tmp_path), phrase_index.vocab)
+
+    np.testing.assert_array_equal(loaded.find("quick brown"), phrase_index.find("quick brown"))
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from helpers.quantized_embeddings import QuantizedEmbeddings
+
+
+@pytest.fixture
+def embeddings():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(300, 16)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_scores_are_close_to_exact(embeddings, dtype):
+    store = QuantizedEmbeddings.quantize(embeddings, dtype=dtype, block_size=64)
+    queries = embeddings[:5]
+
+    np.testing.assert_allclose(store.scores(queries), queries @ embeddings.T, atol=0.02)
+    assert store.scores(queries[0]).shape == (len(embeddings),)
+
+
+def test_rescoring_restores_exact_top_scores(embeddings):
+    store = QuantizedEmbeddings.quantize(embeddings, dtype="int8", full_precision=embeddings)
+    query = embeddings[3]
+
+    scores = store.scores(query, rescore_top_k=10)
+
+    best = np.argsort(-scores)[:10]
+    np.testing.assert_allclose(scores[best], embeddings[best] @ query, rtol=1e-5)
+    assert best[0] == 3
+
+
+def test_rescoring_needs_full_precision(embeddings):
+    store = QuantizedEmbeddings.quantize(embeddings, dtype="int8")
+
+    assert not store.can_rescore
+    np.testing.assert_array_equal(store.scores(embeddings[0], rescore_top_k=10), store.scores(embeddings[0]))
+    assert not QuantizedEmbeddings.quantize(embeddings, full_precision=embeddings).can_rescore
+
+
+def test_unsupported_dtype(embeddings):
+    with pytest.raises(ValueError):
+        QuantizedEmbeddings.quantize(embeddings, dtype="float64")
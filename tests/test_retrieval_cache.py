@@ -0,0 +1,48 @@
+from helpers.retrieval_cache import RetrievalCache
+
+
+def test_make_key_changes_with_index_version():
+    key = RetrievalCache.make_key("query", 1, top_k=5)
+
+    assert key == RetrievalCache.make_key("query", 1, top_k=5)
+    assert key != RetrievalCache.make_key("query", 2, top_k=5)
+
+
+def test_make_key_changes_with_params():
+    key = RetrievalCache.make_key("query", 1, top_k=5, mode="fusion")
+
+    assert key == RetrievalCache.make_key("query", 1, mode="fusion", top_k=5)
+    assert key != RetrievalCache.make_key("query", 1, top_k=10, mode="fusion")
+    assert key != RetrievalCache.make_key("query", 1, top_k=5, mode="hybrid")
+
+
+def test_evicts_least_recently_used():
+    cache = RetrievalCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_stats_count_hits_and_misses():
+    cache = RetrievalCache(max_size=2)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("missing")
+
+    stats = cache.stats()
+    assert stats["size"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_clear_drops_entries():
+    cache = RetrievalCache()
+    cache.put("a", 1)
+    cache.clear()
+
+    assert cache.get("a") is None
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("jet")
+
+from helpers.semantic_cache import SemanticAnswerCache, hash_contexts, replay_answer
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_lookup_matches_similar_queries_in_the_same_bucket():
+    cache = SemanticAnswerCache("model")
+    cache.add(unit(1, 0, 0), "bucket", "answer")
+
+    assert cache.lookup(unit(1, 0.1, 0), "bucket", threshold=0.9) == "answer"
+    assert cache.lookup(unit(0, 1, 0), "bucket", threshold=0.9) is None
+    assert cache.lookup(unit(1, 0, 0), "other", threshold=0.9) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_evicts_oldest_entry_within_a_full_bucket():
+    cache = SemanticAnswerCache("model", max_entries=2)
+    cache.add(unit(1, 0, 0), "bucket", "first")
+    cache.add(unit(0, 1, 0), "bucket", "second")
+    cache.add(unit(0, 0, 1), "bucket", "third")
+
+    assert cache.lookup(unit(1, 0, 0), "bucket", threshold=0.99) is None
+    assert cache.lookup(unit(0, 0, 1), "bucket", threshold=0.99) == "third"
+    assert cache.stats()["size"] == 2
+
+
+def test_evicts_from_the_least_recently_used_bucket():
+    cache = SemanticAnswerCache("model", max_entries=2)
+    cache.add(unit(1, 0, 0), "old", "old answer")
+    cache.add(unit(1, 0, 0), "recent", "recent answer")
+    cache.lookup(unit(1, 0, 0), "old", threshold=0.9)
+    cache.add(unit(0, 1, 0), "new", "new answer")
+
+    assert cache.lookup(unit(1, 0, 0), "recent", threshold=0.9) is None
+    assert cache.lookup(unit(1, 0, 0), "old", threshold=0.9) == "old answer"
+    assert cache.stats()["buckets"] == 2
+
+
+def test_ring_grows_past_its_initial_capacity():
+    cache = SemanticAnswerCache("model", max_entries=100)
+    rng = np.random.default_rng(0)
+    vectors = [unit(*rng.normal(size=8)) for _ in range(40)]
+    for idx, vector in enumerate(vectors):
+        cache.add(vector, "bucket", idx)
+
+    assert all(cache.lookup(vector, "bucket", threshold=0.999) == idx
+               for idx, vector in enumerate(vectors))
+
+
+def test_purge_drops_every_entry():
+    cache = SemanticAnswerCache("model")
+    cache.add(unit(1, 0), "a", 1)
+    cache.add(unit(0, 1), "b", 2)
+
+    assert cache.purge() == 2
+    assert cache.lookup(unit(1, 0), "a", threshold=0.5) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_helpers():
+    assert hash_contexts([]) == ""
+    assert hash_contexts(["a", "b"]) != hash_contexts(["ab"])
+    assert "".join(replay_answer("one two three")) == "one two three"
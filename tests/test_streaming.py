@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("jet")
+pytest.importorskip("fastapi")
+
+from routes.rerankers.streaming import TopKAccumulator, collect_ranking
+
+
+def format_result(group, row, score):
+    return {"group": group, "row": row, "score": score}
+
+
+def test_keeps_the_best_rows_across_batches():
+    accumulator = TopKAccumulator(num_groups=1, top_k=3)
+    accumulator.add(0, np.array([0, 1, 2]), np.array([0.1, 0.9, 0.5]))
+    accumulator.add(0, np.array([3, 4]), np.array([0.7, 0.2]))
+
+    assert accumulator.rows[0].tolist() == [1, 3, 2]
+    np.testing.assert_allclose(accumulator.scores[0], [0.9, 0.7, 0.5])
+
+
+def test_without_top_k_every_row_is_kept_in_order():
+    accumulator = TopKAccumulator(num_groups=1)
+    accumulator.add(0, np.array([0, 1]), np.array([0.2, 0.4]))
+    accumulator.add(0, np.array([2]), np.array([0.3]))
+
+    assert accumulator.rows[0].tolist() == [1, 2, 0]
+
+
+def test_groups_are_ranked_independently():
+    batches = [
+        (0, np.array([0, 1]), np.array([0.1, 0.8])),
+        (1, np.array([0, 1]), np.array([0.6, 0.3])),
+        (0, np.array([2]), np.array([0.5])),
+    ]
+
+    ranking = collect_ranking(iter(batches), num_groups=2, format_result=format_result, top_k=2)
+
+    assert ranking["count"] == 4
+    assert [(result["group"], result["row"]) for result in ranking["data"]] == [
+        (0, 1), (0, 2), (1, 0), (1, 1)]
+
+
+def test_ranking_limit_applies_per_group():
+    accumulator = TopKAccumulator(num_groups=2)
+    accumulator.add(0, np.array([0, 1]), np.array([0.1, 0.2]))
+    accumulator.add(1, np.array([0, 1]), np.array([0.4, 0.3]))
+
+    assert [result["row"] for result in accumulator.ranking(format_result, limit=1)] == [1, 0]